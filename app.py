@@ -5,7 +5,13 @@ import json
 from typing import List, Dict
 from pydantic import BaseModel, Field
 from backend.agents_llm.nutritionist import NutritionPipeline
+from backend.semantic_cache import SemanticCache
 from src.workout_log.workout_parser import *
+from src.workout_log.log_store import WorkoutLogStore, migrate_csv_log
+from src.workout_log.records import PersonalRecords
+from src.workout_log.gym_analytics import discover_user_logs
+from src.workout_log.log_loader import load_workout_log, log_signature
+from src.workout_log.image_preprocessing import DEFAULT_BYTE_BUDGET
 from backend.models import *
 import pandas as pd
 from datetime import datetime
@@ -18,14 +24,53 @@ WORKOUT_LOGS = Path(os.path.join(os.getcwd(), "data", "workout_logs"))
 os.makedirs(WORKOUT_LOGS, exist_ok=True)
 
 
+@st.cache_resource
+def get_log_store(username):
+    # Kept across reruns so the set hash index is only loaded once
+    return WorkoutLogStore(WORKOUT_LOGS, username)
+
+
+@st.cache_resource
+def get_personal_records(username):
+    # Built from the stored log on first use, then updated on each save
+    return PersonalRecords.load(get_log_store(username))
+
+
+@st.cache_resource(max_entries=8)
+def load_cached_log(path: str, signature: tuple):
+    # The signature is only part of the cache key: reruns reuse the typed frame
+    # until a save changes the files of the log. The frame is shared by every
+    # rerun and session rather than copied (as st.cache_data would do on each
+    # hit): callers must treat it as read-only
+    return load_workout_log(path)
+
+
+@st.cache_resource
+def get_nutrition_pipeline():
+    # Prompts, parsers and the compiled graph are built once per process, the
+    # answer cache is shared by every session
+    return NutritionPipeline(cache=SemanticCache())
+
+
+@st.cache_resource
+def get_workout_logger():
+    # One logger per process: chains and HTTP clients are reused across reruns
+    return WorkoutLogger()
+
+
 def workout_log_interface(username):
     st.title(f"Logger")
+    log_store = get_log_store(username)
+    csv_path = os.path.join(WORKOUT_LOGS, f"{username}.csv")
+    if not log_store.exists() and os.path.isfile(csv_path):
+        # One-shot migration of the legacy CSV log
+        migrate_csv_log(csv_path, log_store)
     upload_workout = st.expander(
         "Upload an existing workout (text or image)", expanded=True
     )
 
     if "logged_workouts" not in st.session_state:
-        st.session_state["logged_workouts"] = pd.DataFrame()
+        st.session_state["logged_workouts"] = WorkoutLog()
     with upload_workout:
         col1, col2 = st.columns([0.7, 0.3])
         upload_mode = col1.radio(
@@ -62,41 +107,48 @@ def workout_log_interface(username):
             for note_img_p in notes_img_paths:
                 with open(note_img_p, "rb") as file:
                     notes_img.append(file.read())
+        bypass_cache = col1.checkbox("Ignore cached parses")
         if col1.button("Generate"):
-            logger_agent = WorkoutLogger()
+            logger_agent = get_workout_logger()
 
             with st.spinner("BroCoach logging workout..."):
                 if notes_img is not None:
                     df_tabs = col1.tabs(img_names)
-                    for i in range(len(notes_img)):
-                        workout = logger_agent.generate(
-                            input_text=notes_text,
-                            input_img=notes_img[i],
-                            img_scale_factor=0.1,
-                            img_quality=75,
-                        )
+                    workouts = [None] * len(notes_img)
+                    # Render each parse as soon as its LLM call returns
+                    for i, workout in logger_agent.generate_batch_as_completed(
+                        input_imgs=notes_img,
+                        img_byte_budget=DEFAULT_BYTE_BUDGET,
+                        bypass_cache=bypass_cache,
+                    ):
+                        if isinstance(workout, Exception):
+                            df_tabs[i].error(f"Could not log {img_names[i]}: {workout}")
+                            continue
+                        workouts[i] = workout
                         st.session_state[img_names[i]] = workout_to_dataframe(
                             workout=workout
                         )
                         df_tabs[i].dataframe(
                             st.session_state[img_names[i]], use_container_width=True
                         )
-                        st.session_state["logged_workouts"] = add_workout_to_dataframe(
-                            workout=workout,
-                            df=st.session_state["logged_workouts"],
-                        )
+                    for workout in workouts:
+                        if workout is not None:
+                            st.session_state["logged_workouts"].add(workout)
                 else:
-                    workout = logger_agent.generate(input_text=notes_text)
-                    workout_df = workout_to_dataframe(workout=workout)
-                    col1.dataframe(workout_df)
-                    st.session_state["logged_workouts"] = add_workout_to_dataframe(
-                        workout=workout,
-                        df=st.session_state["logged_workouts"],
+                    workout = logger_agent.generate(
+                        input_text=notes_text, bypass_cache=bypass_cache
                     )
+                    workout_df = st.session_state["logged_workouts"].add(workout)
+                    col1.dataframe(workout_df)
+            cache_stats = logger_agent.cache.stats()
+            col1.caption(
+                f"Parse cache: {cache_stats['hits']} hits, "
+                f"{cache_stats['misses']} misses"
+            )
 
         st.markdown("## Full log preview")
         st.dataframe(
-            st.session_state["logged_workouts"],
+            st.session_state["logged_workouts"].to_dataframe(),
             use_container_width=True,
             height=500,
         )
@@ -106,47 +158,55 @@ def workout_log_interface(username):
             # disabled=("workout_df" not in st.session_state),
         )
         if save_workout:
-            csv_path = os.path.join(
-                WORKOUT_LOGS,
-                f"{username}.csv",
-            )
-            file_exists = os.path.isfile(csv_path)
-            if file_exists:
-                existing_log = pd.read_csv(csv_path, delimiter=",")
-                combined_log = pd.concat(
-                    [existing_log, st.session_state["logged_workouts"]]
-                )
-                combined_log = combined_log.drop_duplicates()
-            else:
-                combined_log = st.session_state["logged_workouts"].drop_duplicates()
-            combined_log.to_csv(
-                csv_path,
-                index=False,
-            )
-            st.warning("Saved")
+            logged_workouts = st.session_state["logged_workouts"].to_dataframe()
+            # Loaded before the append, so that records are compared to the
+            # history without this session's sets
+            personal_records = get_personal_records(username)
+            n_saved = log_store.append(logged_workouts)
+            st.warning(f"Saved {n_saved} new sets")
+            new_prs = personal_records.update(logged_workouts)
+            personal_records.save(log_store)
+            for pr in new_prs.to_dict("records"):
+                if pd.notna(pr["Previous"]):
+                    st.success(
+                        f"New PR! {pr['Exercise name']} ({pr['Equipment']}, "
+                        f"{pr['Execution mode']}): {pr['Metric']} "
+                        f"{pr['Value']:g} (previous {pr['Previous']:g})"
+                    )
 
     # start_workout = st.expander("Start a fresh new workout")
     # with start_workout:
     #     start = st.button("Start")
     # os.makedirs(os.path.join(WORKOUT_LOGS, username), exist_ok=True)
     # workouts = os.listdir(os.path.join(WORKOUT_LOGS, username))
-    workout_log_path = os.path.join(WORKOUT_LOGS, f"{username}.csv")
-    if os.path.isfile(workout_log_path):
-        workout_log = pd.read_csv(workout_log_path, delimiter=",")
+    if log_store.exists():
+        workout_log = load_cached_log(
+            str(log_store.path), log_signature(log_store.path)
+        )
         st.dataframe(
             workout_log,
             use_container_width=True,
         )
+        personal_records = get_personal_records(username)
+        lift = st.selectbox(
+            "Progress",
+            personal_records.lifts(),
+            format_func=lambda lift: " / ".join(lift),
+        )
+        if lift is not None:
+            st.line_chart(
+                personal_records.history(*lift)[["Best Weight", "e1RM (Epley)"]]
+            )
     else:
         st.error(f"No workout logged yet for {username}.")
 
 
 def main():
-    initialize_session_state()
-
     st.sidebar.title("User settings")
     page = st.sidebar.radio("Mode", ["Workout log", "Nutritionist"])
-    username = st.sidebar.selectbox("Select user", ["toubounou"])
+    username = st.sidebar.selectbox(
+        "Select user", discover_user_logs(WORKOUT_LOGS) or ["toubounou"]
+    )
     if page == "Nutritionist":
         chat_interface(username)
     elif page == "Workout log":
@@ -162,16 +222,33 @@ def get_user_information(nickname: str) -> Dict:
     return {}
 
 
-def initialize_session_state():
-    if "chat_history" not in st.session_state:
-        st.session_state.chat_history = []
-
-
-def generate_response(workflow, input):
-    output = workflow.invoke(input)
-    display_diet_plan(diet_plan=output["diet_plan"])
-    display_cookbook(cookbook=output["cookbook"])
-    st.markdown(output["response"])
+def generate_response(nutri_bro, workflow, input):
+    # Each part is rendered as soon as its node finishes, then the final answer
+    # is written token by token
+    timings = {}
+    events = nutri_bro.stream_response(workflow, input, timings)
+    # The diet plan explanation and the cookbook are built in parallel and may
+    # arrive in any order, the answer tokens only come after both
+    shown = set()
+    for kind, payload in events:
+        if kind == "diet_plan":
+            display_diet_plan(diet_plan=payload)
+        elif kind == "cookbook":
+            display_cookbook(cookbook=payload)
+        shown.add(kind)
+        if {"diet_plan", "cookbook"} <= shown:
+            break
+    response = st.write_stream(
+        payload for kind, payload in events if kind == "token"
+    )
+    if timings.get("cache_hit"):
+        st.caption(f"Answered from cache in {timings.get('total', 0):.2f} s")
+    else:
+        st.caption(
+            f"First content after {timings.get('first_content', 0):.1f} s, "
+            f"done in {timings.get('total', 0):.1f} s"
+        )
+    return response
 
 
 def display_cookbook(cookbook: CookBook):
@@ -193,14 +270,22 @@ def display_diet_plan(diet_plan=DietPlanReport):
 def chat_interface(username):
     st.title("AI-Bro (Nutritionist)")
     user = get_user_information(username)
+    if not user:
+        st.error(f"No personal information for {username} in data/users.json.")
+        return
     with st.sidebar.expander("Personal information", expanded=True):
         st.dataframe(
             pd.DataFrame(data=user.values(), index=user.keys()),
             use_container_width=True,
         )
 
-    nutri_bro = NutritionPipeline()
+    nutri_bro = get_nutrition_pipeline()
     nutri_pipe = nutri_bro.pipeline()
+    if "chat_memory" not in st.session_state:
+        # Last turns verbatim and a summary of the older ones: the prompt
+        # stays the same size however long the session. Created here, so the
+        # other pages need neither the LLM nor the tokenizer
+        st.session_state.chat_memory = nutri_bro.new_memory()
 
     if "messages" not in st.session_state:
         st.session_state.messages = []
@@ -213,7 +298,7 @@ def chat_interface(username):
         initial_state = State(
             user_info=user,
             question=question,
-            chat_history=st.session_state.chat_history,
+            chat_history=st.session_state.chat_memory.messages(),
             diet_plan=None,
             cookbook=None,
             response="",
@@ -223,7 +308,11 @@ def chat_interface(username):
             st.markdown(question)
 
         with st.chat_message("assistant"):
-            generate_response(workflow=nutri_pipe, input=initial_state)
+            response = generate_response(
+                nutri_bro=nutri_bro, workflow=nutri_pipe, input=initial_state
+            )
+        st.session_state.messages.append({"role": "assistant", "content": response})
+        st.session_state.chat_memory.add_turn(question, response)
 
             #     # diet_plan = s["nutritionist"]["diet_plan"]
             #     # report_col.warning(diet_plan["goal"])
@@ -1,4 +1,7 @@
+import asyncio
 import os
+import time
+from functools import partial
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -6,75 +9,53 @@ from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
 
 
-from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.language_models import BaseChatModel
+from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
 
-from langchain.memory import ConversationBufferMemory
 from langgraph.graph import END, StateGraph, START
 
 openai_api_key = os.getenv("OPENAI_API_KEY")
 
 
-from langchain.memory import ConversationBufferMemory
+from ..chat_memory import ChatMemory
 from ..models import *
+from ..nutrition_engine import diet_plan_numbers, infer_goal
+from ..semantic_cache import SemanticCache
 
 
-class NutritionPipeline:
-    def __init__(self, llm="gpt-4o-mini"):
-        self.llm = ChatOpenAI(model=llm)
-        self.chat_history = ConversationBufferMemory()
-
-    def nutritionist(self, state: State):
+# Share of the daily kcals and macros given to each meal, cooked in parallel
+MEAL_SHARES = {"breakfast": 0.25, "lunch": 0.40, "dinner": 0.35}
 
-        parser = JsonOutputParser(pydantic_object=DietPlanReport)
-        system = """
-        You are AI-BRO diet planner. To make a diet plan, follow these steps: \n
+NUTRITIONIST_SYSTEM = """
+        You are AI-BRO diet planner. The numbers of the diet plan were already computed \
+        (Mifflin-St Jeor TDEE, 5-10 percent deficit/surplus, 1g of fat/kg, 1 to 2g of proteins/kg, \
+        the rest in carbohydrates): {diet_plan}\n
         1. Consider past info from the user :{user_info}\n
         2. Understand the user challenge : {question}\n
-        3. Determine the strategy to take. What does he have to change in his diet?
-        4. Then, proceed this way:
-        4.1 Calculate total daily energy expenditure with the information you have\n
-        4.2 Take a calorie deficit/surplus of 5-10 percent of total energy expenditure, depending on user's goal, \
-        and determine the total kcal intake. \n
-        4.3 Deduce macronutrients quantities per day. 1g of proteins or carbs is 4kcal and 1g of fat is 9 kcal, \
-        the user needs 1g of fat/kg of bodyweight, 1 to 2g of proteins/kg of bodyweight (1 if sedentary, 2 if very sportive) and the rest in carbohydrates.\n
-        4.4 Make your results in a structured output following : {format_instructions}. \n
-        Context of conversation: {chat_history}\n
+        3. Explain in a few sentences the strategy to take: what does he have to change in his diet, \
+        and why these kcals and macros fit his goal. Do not recompute the numbers.\n
         Go on ! \n
         """
-        prompt = ChatPromptTemplate.from_messages(
-            [
-                ("system", system),
-                ("placeholder", "{chat_history}"),
-                ("human", "{question}"),
-            ]
-        ).partial(format_instructions=parser.get_format_instructions())
 
-        chain = prompt | self.llm | parser
-        diet_plan = chain.invoke(state)
-        return {"diet_plan": diet_plan}
-
-    def cook(self, state: State):
-
-        parser = JsonOutputParser(pydantic_object=CookBook)
-        system = """
-        You are AI-BRO cook. To create meals , follow these steps: \n
+COOK_TEMPLATE = """
+        You are AI-BRO cook. To create one meal of the day, follow these steps: \n
         1. Consider diet plan :{diet_plan}\n
         2. Analyze user profile : {user_info}\n
-        3. Build three meals : breakfast, lunch and diner to fit the diet plan and respect macronutrients and kcals.\n
-        4. Put your meals in a cookbook using a structured output, following : {format_instructions}. \n
+        3. Build the {meal} only, so that it provides about {kcals:.0f} kcals, {g_proteins:.0f}g of proteins, \
+        {g_fat:.0f}g of fat and {g_carbohydrates:.0f}g of carbohydrates.\n
+        4. Put your meal in a structured output, following : {format_instructions}. \n
         Go on ! \n
         """
-        prompt = ChatPromptTemplate.from_template(template=system).partial(
-            format_instructions=parser.get_format_instructions()
-        )
 
-        chain = prompt | self.llm | parser
-        cookbook = chain.invoke(state)
-        return {"cookbook": cookbook}
+SUMMARY_TEMPLATE = """
+        You are AI-BRO assistant. Update the summary of your conversation with the user.\n
+        Current summary: {summary}\n
+        New exchanges:\n{turns}\n
+        Keep the user's goals, preferences, constraints and the advice already given, \
+        in at most {max_words} words. Answer with the summary only.\n
+        """
 
-    def generate_final_response(self, state: State):
-        prompt = ChatPromptTemplate.from_template(
-            """
+FINAL_RESPONSE_TEMPLATE = """
         Based on the user's query: {question}
         And the generated diet plan: {diet_plan}
         And the cookbook: {cookbook}
@@ -87,24 +68,241 @@ class NutritionPipeline:
 
         Make sure the response is well-structured, informative, and engaging.
         """
+
+
+def meal_targets(diet_plan: dict, meal: str) -> dict:
+    """Kcals and macros of a meal: its share of the diet plan's daily intake."""
+    share = MEAL_SHARES[meal]
+    macros = diet_plan.get("macros") or {}
+    return {
+        "kcals": float(diet_plan.get("kcal_intake") or 0) * share,
+        **{
+            key: float(macros.get(key) or 0) * share
+            for key in MacroNutritiens.model_fields
+        },
+    }
+
+
+class NutritionPipeline:
+    def __init__(
+        self,
+        llm: str | BaseChatModel = "gpt-4o-mini",
+        cache: SemanticCache | None = None,
+    ):
+        if isinstance(llm, str):
+            llm = ChatOpenAI(model=llm)
+        self.llm = llm
+        self.cache = cache
+
+        # Prompts, parsers and chains are built once and shared by every request
+        nutritionist_prompt = ChatPromptTemplate.from_messages(
+            [
+                ("system", NUTRITIONIST_SYSTEM),
+                ("placeholder", "{chat_history}"),
+                ("human", "{question}"),
+            ]
         )
+        self.nutritionist_chain = nutritionist_prompt | self.llm | StrOutputParser()
+
+        meal_parser = JsonOutputParser(pydantic_object=Meal)
+        cook_prompt = ChatPromptTemplate.from_template(template=COOK_TEMPLATE).partial(
+            format_instructions=meal_parser.get_format_instructions()
+        )
+        self.cook_chain = cook_prompt | self.llm | meal_parser
+
+        final_prompt = ChatPromptTemplate.from_template(FINAL_RESPONSE_TEMPLATE)
+        self.final_response_chain = final_prompt | self.llm
 
-        chain = prompt | self.llm
+        summary_prompt = ChatPromptTemplate.from_template(SUMMARY_TEMPLATE)
+        self.summary_chain = summary_prompt | self.llm | StrOutputParser()
+        self._workflow = None
+
+    def new_memory(self, **kwargs) -> ChatMemory:
+        """
+        Chat memory of a session, summarizing old turns with this pipeline's
+        LLM. Its messages() go to the chat_history of the State.
+        """
+        return ChatMemory(summarizer=self.summary_chain, **kwargs)
+
+    def diet_calculator(self, state: State):
+        # Kcals and macros are computed locally, in microseconds and always the
+        # same for the same user and goal
+        goal = infer_goal(state["question"])
+        user = state["user_info"] or {}
+        try:
+            return {"diet_plan": diet_plan_numbers(user, goal)}
+        except ValueError as e:
+            raise ValueError(
+                f"Cannot compute the diet plan of {user.get('nickname', 'this user')}"
+                f": {e}. Complete their profile in data/users.json."
+            ) from e
+
+    def nutritionist(self, state: State):
+        # Only the explanation of the strategy is left to the LLM. It runs in
+        # parallel with the cooks, which only need the numbers
+        explanation = self.nutritionist_chain.invoke(state)
+        return {"diet_plan": {**state["diet_plan"], "explanation": explanation}}
+
+    def cook_meal(self, state: State, meal: str):
+        # One branch per meal, all run in parallel once the diet plan exists
+        cooked = self.cook_chain.invoke(
+            {
+                "diet_plan": state["diet_plan"],
+                "user_info": state["user_info"],
+                "meal": meal,
+                **meal_targets(state["diet_plan"], meal),
+            }
+        )
+        return {"meals": [{"meal": meal, **cooked}]}
+
+    def cook(self, state: State):
+        # Join of the meal branches, in breakfast, lunch, dinner order
+        meals = sorted(state["meals"], key=lambda m: list(MEAL_SHARES).index(m["meal"]))
+        return {"cookbook": {"meals": meals}}
+
+    def generate_final_response(self, state: State):
         # force output to State format?
-        response = chain.invoke(state)
+        response = self.final_response_chain.invoke(state)
         return {"response": response.content}
 
     def pipeline(self):
+        """
+        Compiled graph (built once): diet_calculator -> nutritionist and one
+        cook branch per meal, all run in parallel -> cook (join into the
+        cookbook) -> final_response once both the explanation and the cookbook
+        are ready.
+        """
+        if self._workflow is not None:
+            return self._workflow
         workflow = StateGraph(State)
 
+        workflow.add_node("diet_calculator", self.diet_calculator)
         workflow.add_node("nutritionist", self.nutritionist)
+        workflow.add_edge("diet_calculator", "nutritionist")
+        branches = []
+        for meal in MEAL_SHARES:
+            workflow.add_node(f"cook_{meal}", partial(self.cook_meal, meal=meal))
+            workflow.add_edge("diet_calculator", f"cook_{meal}")
+            branches.append(f"cook_{meal}")
         workflow.add_node("cook", self.cook)
         workflow.add_node("final_response", self.generate_final_response)
 
-        workflow.add_edge("nutritionist", "cook")
-        workflow.add_edge("cook", "final_response")
+        workflow.add_edge(branches, "cook")
+        workflow.add_edge(["nutritionist", "cook"], "final_response")
         workflow.add_edge("final_response", END)
 
-        workflow.set_entry_point("nutritionist")
+        workflow.set_entry_point("diet_calculator")
+
+        self._workflow = workflow.compile()
+        return self._workflow
+
+    @staticmethod
+    def _stream_event(mode, chunk, timings, start):
+        # Translate a ("updates" | "messages") chunk of the graph stream into
+        # the events of stream_response, and record when each one arrived
+        if mode == "updates":
+            for node, update in chunk.items():
+                if node == "nutritionist":
+                    key, payload = "diet_plan", update["diet_plan"]
+                elif node == "cook":
+                    key, payload = "cookbook", update["cookbook"]
+                else:
+                    continue
+                timings.setdefault(key, time.perf_counter() - start)
+                timings.setdefault("first_content", timings[key])
+                yield key, payload
+        else:
+            message, metadata = chunk
+            if metadata.get("langgraph_node") == "final_response" and message.content:
+                timings.setdefault("first_token", time.perf_counter() - start)
+                timings.setdefault("first_content", timings["first_token"])
+                yield "token", message.content
+
+    @staticmethod
+    def _cache_profile(state: State) -> dict:
+        # The answer depends on the profile and on the goal, which also sets
+        # the diet plan numbers: "I want to bulk" never matches "I want to cut"
+        return {"user_info": state["user_info"], "goal": infer_goal(state["question"])}
+
+    def _cache_lookup(self, state: State):
+        # A follow-up ("and without dairy?") depends on the conversation, not
+        # only on the question: answers with a history are neither looked up
+        # nor stored
+        if self.cache is None or state.get("chat_history"):
+            return None
+        return self.cache.lookup(self._cache_profile(state), state["question"])
+
+    @staticmethod
+    def _cached_events(value, timings, start):
+        # A cache hit is replayed as the events of a run, all available at once
+        events = [
+            ("diet_plan", "diet_plan", value["diet_plan"]),
+            ("cookbook", "cookbook", value["cookbook"]),
+            ("first_token", "token", value["response"]),
+        ]
+        for timing, kind, payload in events:
+            timings.setdefault(timing, time.perf_counter() - start)
+            timings.setdefault("first_content", timings[timing])
+            yield kind, payload
+
+    @staticmethod
+    def _collect(answer, kind, payload):
+        if kind == "token":
+            answer["response"] += payload
+        else:
+            answer[kind] = payload
+
+    def _cache_store(self, lookup, answer, timings):
+        if lookup is not None and {"diet_plan", "cookbook"} <= answer.keys():
+            self.cache.store(lookup, answer, timings["total"])
+
+    def stream_response(self, workflow, state: State, timings: dict = None):
+        """
+        Run the compiled pipeline and yield its results as soon as they exist:
+        ("diet_plan", dict) when the nutritionist node finishes, ("cookbook",
+        dict) after the cook, then ("token", str) for each token of the final
+        response. If given, `timings` is filled with the seconds elapsed until
+        each of them, the first content and the end of the run.
+
+        With a semantic cache, the first question of a conversation (empty
+        chat_history) that is close to one already answered for the same
+        profile and goal replays the stored answer (the whole response as one
+        token) and `timings["cache_hit"]` is True.
+        """
+        timings = {} if timings is None else timings
+        start = time.perf_counter()
+        lookup = self._cache_lookup(state)
+        timings["cache_hit"] = lookup is not None and lookup.hit
+        if timings["cache_hit"]:
+            yield from self._cached_events(lookup.value, timings, start)
+            timings["total"] = time.perf_counter() - start
+            return
+        answer = {"response": ""}
+        for mode, chunk in workflow.stream(state, stream_mode=["updates", "messages"]):
+            for kind, payload in self._stream_event(mode, chunk, timings, start):
+                self._collect(answer, kind, payload)
+                yield kind, payload
+        timings["total"] = time.perf_counter() - start
+        self._cache_store(lookup, answer, timings)
 
-        return workflow.compile()
+    async def astream_response(self, workflow, state: State, timings: dict = None):
+        """Async version of stream_response."""
+        timings = {} if timings is None else timings
+        start = time.perf_counter()
+        # The embedding call of the lookup blocks: keep it off the event loop
+        lookup = await asyncio.to_thread(self._cache_lookup, state)
+        timings["cache_hit"] = lookup is not None and lookup.hit
+        if timings["cache_hit"]:
+            for event in self._cached_events(lookup.value, timings, start):
+                yield event
+            timings["total"] = time.perf_counter() - start
+            return
+        answer = {"response": ""}
+        async for mode, chunk in workflow.astream(
+            state, stream_mode=["updates", "messages"]
+        ):
+            for kind, payload in self._stream_event(mode, chunk, timings, start):
+                self._collect(answer, kind, payload)
+                yield kind, payload
+        timings["total"] = time.perf_counter() - start
+        await asyncio.to_thread(self._cache_store, lookup, answer, timings)
@@ -6,14 +6,12 @@ from typing import Optional, Type
 from langchain_core.callbacks import (
     CallbackManagerForToolRun,
 )
-from langchain_community.document_loaders import WebBaseLoader
-from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain.tools.retriever import create_retriever_tool
 from pydantic import BaseModel, Field
 from typing import Any
-from langchain_community.document_loaders.excel import UnstructuredExcelLoader
+
+from backend.nutrition_engine import GENDER_OFFSETS, mifflin_st_jeor, normalize_gender
+from backend.nutrition_index import get_vectorstore
 
 
 def get_user_information(nickname: str):
@@ -115,49 +113,25 @@ class CalorieIntakeCalculatorTool(BaseTool):
     ) -> str:
         """Use the tool."""
 
-        if personal_info.gender == "male":
-            return (
-                10 * personal_info.weight
-                + 6.25 * personal_info.height
-                - 5 * personal_info.age
-                + 5
-            ) * personal_info.activity_factor
-        elif personal_info.gender == "female":
-            return (
-                10 * personal_info.weight
-                + 6.25 * personal_info.height
-                - 5 * personal_info.age
-                - 161
-            ) * personal_info.activity_factor
+        # users.json stores "M"/"F", the LLM may pass "male"/"female"
+        gender = normalize_gender(personal_info.gender)
+        return (
+            mifflin_st_jeor(
+                personal_info.weight,
+                personal_info.height,
+                personal_info.age,
+                GENDER_OFFSETS[gender],
+            )
+            * personal_info.activity_factor
+        )
 
 
 def nutrition_db_retriever_tool():
     """
-    Retrieves relevant information about nutrition.
+    Retrieves relevant information about nutrition, from the index built
+    offline by `python -m backend.nutrition_index` and loaded once per process.
     """
-    loader = UnstructuredExcelLoader(
-        "datasets/apports_nutritionnels.xlsx", mode="elements"
-    )
-    urls = [
-        "https://ai.hubermanlab.com/s/idROLBEo",
-        "https://www.hubermanlab.com/newsletter/foundational-fitness-protocol",
-        "https://www.hubermanlab.com/newsletter/improve-your-sleep",
-    ]
-    docs = [WebBaseLoader(url).load() for url in urls] + loader.load()
-    docs_list = [item for sublist in docs for item in sublist]
-
-    text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-        chunk_size=100, chunk_overlap=50
-    )
-    doc_splits = text_splitter.split_documents(docs_list)
-
-    # Add to vectorDB
-    vectorstore = Chroma.from_documents(
-        documents=doc_splits,
-        collection_name="rag-chroma",
-        embedding=OpenAIEmbeddings(),
-    )
-    retriever = vectorstore.as_retriever()
+    retriever = get_vectorstore().as_retriever()
 
     retriever_tool = create_retriever_tool(
         retriever,
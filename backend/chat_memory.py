@@ -0,0 +1,119 @@
+"""
+Token-budgeted chat memory of the nutrition agent: the last turns are kept
+verbatim, older ones are folded into a running summary, so the history given
+to the prompt stays under a fixed number of tokens however long the session.
+"""
+from collections import deque
+from functools import lru_cache
+
+import tiktoken
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = DEFAULT_MODEL) -> tiktoken.Encoding:
+    """tiktoken encoding of a model, loaded once per process."""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def format_turns(turns) -> str:
+    return "\n".join(f"User: {q}\nAI-Bro: {a}" for q, a in turns)
+
+
+class ChatMemory:
+    """
+    History of one chat session. At most `max_turns` turns and
+    `max_history_tokens` tokens are kept verbatim; the turns pushed out are
+    summarized by `summarizer` (a runnable taking summary, turns and
+    max_words, see NutritionPipeline.new_memory) into a summary of at most
+    `max_summary_tokens` tokens. Without a summarizer the pushed out turns
+    are kept as text, truncated to the same budget.
+
+    Tokens are counted once per turn with the tiktoken encoding of the model.
+    """
+
+    def __init__(
+        self,
+        summarizer=None,
+        max_turns: int = 4,
+        max_history_tokens: int = 1500,
+        max_summary_tokens: int = 250,
+        encoding: tiktoken.Encoding = None,
+    ):
+        self.summarizer = summarizer
+        self.max_turns = max_turns
+        self.max_history_tokens = max_history_tokens
+        self.max_summary_tokens = max_summary_tokens
+        self.encoding = encoding or get_encoding()
+        # (question, answer, tokens) of the verbatim turns, oldest first
+        self.turns = deque()
+        self.history_tokens = 0
+        self.summary = ""
+        self.summary_tokens = 0
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    @property
+    def tokens(self) -> int:
+        """Tokens of the summary and verbatim turns handed to the prompt."""
+        return self.summary_tokens + self.history_tokens
+
+    def add_turn(self, question: str, answer: str):
+        """
+        Record a question and its answer, then fold the oldest turns into the
+        summary while the verbatim history is over its budgets. Called once the
+        answer has been shown: summarizing is off the response path.
+        """
+        n_tokens = self.count_tokens(question) + self.count_tokens(answer)
+        self.turns.append((question, answer, n_tokens))
+        self.history_tokens += n_tokens
+        pushed_out = []
+        while self.turns and (
+            len(self.turns) > self.max_turns
+            or self.history_tokens > self.max_history_tokens
+        ):
+            question, answer, n_tokens = self.turns.popleft()
+            self.history_tokens -= n_tokens
+            pushed_out.append((question, answer))
+        if pushed_out:
+            self._summarize(pushed_out)
+
+    def _summarize(self, turns):
+        if self.summarizer is None:
+            summary = f"{self.summary}\n{format_turns(turns)}".strip()
+        else:
+            summary = self.summarizer.invoke(
+                {
+                    "summary": self.summary or "(empty)",
+                    "turns": format_turns(turns),
+                    "max_words": self.max_summary_tokens * 3 // 4,
+                }
+            )
+        # Hard cap, whatever the summarizer returned: the most recent part wins
+        tokens = self.encoding.encode(summary, disallowed_special=())
+        if len(tokens) > self.max_summary_tokens:
+            tokens = tokens[-self.max_summary_tokens :]
+            summary = self.encoding.decode(tokens)
+        self.summary, self.summary_tokens = summary, len(tokens)
+
+    def messages(self) -> list:
+        """History for the {chat_history} placeholder of the prompts."""
+        messages = []
+        if self.summary:
+            summary = f"Summary of the earlier conversation: {self.summary}"
+            messages.append(SystemMessage(content=summary))
+        for question, answer, _ in self.turns:
+            messages += [HumanMessage(content=question), AIMessage(content=answer)]
+        return messages
+
+    def clear(self):
+        self.turns.clear()
+        self.history_tokens = 0
+        self.summary = ""
+        self.summary_tokens = 0
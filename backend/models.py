@@ -1,6 +1,8 @@
-from typing import List
+import operator
+from typing import Annotated, List
+from langchain_core.messages import BaseMessage
 from pydantic import BaseModel, Field
-from typing import Literal
+from typing import Literal, Optional
 from typing_extensions import TypedDict
 from datetime import datetime
 
@@ -35,6 +37,9 @@ class DietPlanReport(BaseModel):
     kcal_intake: float = Field(
         description="Total quantity of kcals to be eaten daily to reach goal"
     )
+    tdee: Optional[float] = Field(
+        default=None, description="Total daily energy expenditure, in kcal"
+    )
     method: str = Field(description="Method used to calculate kcal TDEE")
     macros: MacroNutritiens = Field(
         description="Quantity of macronutrients to be eaten daily"
@@ -45,9 +50,11 @@ class DietPlanReport(BaseModel):
 class State(TypedDict):
     user_info: str
     question: str
-    chat_history: List[str]
+    chat_history: List[BaseMessage]
     diet_plan: DietPlanReport
     cookbook: List[Meal]
+    # Meals cooked by the parallel cook branches, concatenated by the reducer
+    meals: Annotated[List[dict], operator.add]
     response: str
 
 
@@ -0,0 +1,170 @@
+"""
+Deterministic diet plan numbers: TDEE (Mifflin-St Jeor x activity factor),
+kcal intake for the user's goal and daily macros, following the rules the
+nutritionist prompt used to hand over to the LLM:
+- 1 g of proteins or carbs is 4 kcal, 1 g of fat is 9 kcal
+- 1 g of fat / kg of bodyweight
+- 1 to 2 g of proteins / kg (1 if sedentary, 2 if very active)
+- the rest in carbohydrates
+"""
+import json
+import re
+
+import numpy as np
+import pandas as pd
+
+KCAL_PER_G = {"g_proteins": 4, "g_fat": 9, "g_carbohydrates": 4}
+FAT_G_PER_KG = 1.0
+# Proteins per kg grow linearly with the activity factor between these bounds
+PROTEIN_G_PER_KG = (1.0, 2.0)
+ACTIVITY_BOUNDS = (1.2, 1.9)
+# Mifflin-St Jeor constant, users.json stores "M"/"F" but the LLM and the
+# calculator tool use "male"/"female": only the initial is looked at
+GENDER_OFFSETS = {"M": 5.0, "F": -161.0}
+GENDER_INITIALS = {"M": "M", "H": "M", "F": "F"}
+# Deficit / surplus as a share of TDEE, within the 5-10% of the guidelines
+GOAL_ADJUSTMENTS = {"lose": -0.10, "maintain": 0.0, "gain": 0.05}
+GOAL_LABELS = {
+    "lose": "Lose fat while keeping muscle",
+    "maintain": "Maintain bodyweight",
+    "gain": "Gain muscle with a lean surplus",
+}
+# Whole words and phrases only ("fatigue" is not "fat"). Explicit maintenance
+# or recomposition wins, then gain phrases are matched and removed before
+# looking for fat loss words, so that "lean bulk" or "bulk without getting
+# fat" stay a bulk; asking for both at once ("gain muscle and lose fat") is a
+# recomposition, planned at maintenance
+GOAL_KEYWORDS = {
+    "maintain": r"\b(recomp\w*|body recomposition|maintain|maintenance|"
+    r"stay in shape|keep my weight|maintien)\b",
+    "gain": r"\b(lean bulk|clean bulk|bulk|bulking|gain|gaining|mass|grow|"
+    r"(build|put on|more) muscles?|prise de masse|grossir)\b",
+    "lose": r"\b(lose|losing|loss|cut|cutting|slim|slimming|shred|shredding|"
+    r"(get|getting) lean|lean out|burn fat|fat loss|perdre|s[eè]che|maigrir)\b",
+}
+METHOD = "Mifflin-St Jeor BMR x activity factor"
+USER_FIELDS = ["gender", "age", "height", "weight", "activity_factor"]
+
+
+def normalize_gender(gender) -> str:
+    """'M', 'male', 'Homme'... -> 'M'; 'F', 'female', 'Femme'... -> 'F'."""
+    initial = str(gender).strip()[:1].upper()
+    if initial not in GENDER_INITIALS:
+        raise ValueError(f"Unknown gender: {gender!r}")
+    return GENDER_INITIALS[initial]
+
+
+def infer_goal(question: str) -> str:
+    """Goal of the user from their question: 'lose', 'gain' or 'maintain'."""
+    question = (question or "").lower()
+    if re.search(GOAL_KEYWORDS["maintain"], question):
+        return "maintain"
+    gain = re.search(GOAL_KEYWORDS["gain"], question)
+    without_gain = re.sub(GOAL_KEYWORDS["gain"], " ", question)
+    lose = re.search(GOAL_KEYWORDS["lose"], without_gain)
+    if gain and lose:
+        return "maintain"
+    if gain:
+        return "gain"
+    if lose:
+        return "lose"
+    return "maintain"
+
+
+def mifflin_st_jeor(weight, height, age, gender_offset):
+    """Basal metabolic rate in kcal/day, works on scalars and arrays."""
+    return 10 * weight + 6.25 * height - 5 * age + gender_offset
+
+
+def protein_per_kg(activity_factor):
+    low, high = ACTIVITY_BOUNDS
+    share = np.clip((np.asarray(activity_factor) - low) / (high - low), 0, 1)
+    return PROTEIN_G_PER_KG[0] + share * (PROTEIN_G_PER_KG[1] - PROTEIN_G_PER_KG[0])
+
+
+def _plan_numbers(weight, height, age, gender_offset, activity_factor, adjustment):
+    # Shared by diet_plan_numbers and bulk_diet_plans: plain arithmetic that
+    # works the same on floats and on NumPy arrays
+    tdee = mifflin_st_jeor(weight, height, age, gender_offset) * activity_factor
+    kcal_intake = tdee * (1 + adjustment)
+    g_proteins = protein_per_kg(activity_factor) * weight
+    g_fat = FAT_G_PER_KG * weight
+    carbs_kcal = (
+        kcal_intake
+        - g_proteins * KCAL_PER_G["g_proteins"]
+        - g_fat * KCAL_PER_G["g_fat"]
+    )
+    g_carbohydrates = np.maximum(carbs_kcal, 0) / KCAL_PER_G["g_carbohydrates"]
+    return tdee, kcal_intake, g_proteins, g_fat, g_carbohydrates
+
+
+def diet_plan_numbers(user: dict, goal: str = "maintain") -> dict:
+    """
+    Numbers of a DietPlanReport (everything but the explanation) for a user
+    record of data/users.json.
+    """
+    missing = [field for field in USER_FIELDS if user.get(field) is None]
+    if missing:
+        raise ValueError(f"Missing user information: {', '.join(missing)}")
+    tdee, kcal_intake, g_proteins, g_fat, g_carbohydrates = _plan_numbers(
+        float(user["weight"]),
+        float(user["height"]),
+        float(user["age"]),
+        GENDER_OFFSETS[normalize_gender(user["gender"])],
+        float(user["activity_factor"]),
+        GOAL_ADJUSTMENTS[goal],
+    )
+    return {
+        "goal": GOAL_LABELS[goal],
+        "tdee": round(float(tdee)),
+        "kcal_intake": round(float(kcal_intake)),
+        "method": METHOD,
+        "macros": {
+            "g_proteins": round(float(g_proteins)),
+            "g_fat": round(float(g_fat)),
+            "g_carbohydrates": round(float(g_carbohydrates)),
+        },
+    }
+
+
+def load_users(path="data/users.json") -> pd.DataFrame:
+    with open(path, "r") as f:
+        return pd.DataFrame(json.load(f)["users"])
+
+
+def bulk_diet_plans(users: pd.DataFrame, goal="maintain") -> pd.DataFrame:
+    """
+    Diet plan numbers of every user at once, with column-wise NumPy arithmetic.
+    `goal` is either one goal for everyone or a column of goals.
+    """
+    genders = users["gender"].astype(str).str.strip().str[:1].str.upper()
+    unknown = ~genders.isin(list(GENDER_INITIALS))
+    if unknown.any():
+        values = users["gender"][unknown].unique()
+        raise ValueError(f"Unknown gender: {', '.join(map(repr, values))}")
+    gender_offset = genders.map(GENDER_INITIALS).map(GENDER_OFFSETS)
+    goals = pd.Series(goal, index=users.index)
+    tdee, kcal_intake, g_proteins, g_fat, g_carbohydrates = _plan_numbers(
+        users["weight"].to_numpy(dtype=float),
+        users["height"].to_numpy(dtype=float),
+        users["age"].to_numpy(dtype=float),
+        gender_offset.to_numpy(dtype=float),
+        users["activity_factor"].to_numpy(dtype=float),
+        goals.map(GOAL_ADJUSTMENTS).to_numpy(dtype=float),
+    )
+    plans = pd.DataFrame(
+        {
+            "goal": goals.map(GOAL_LABELS),
+            "tdee": tdee,
+            "kcal_intake": kcal_intake,
+            "method": METHOD,
+            "g_proteins": g_proteins,
+            "g_fat": g_fat,
+            "g_carbohydrates": g_carbohydrates,
+        },
+        index=users.index,
+    )
+    if "nickname" in users.columns:
+        plans.insert(0, "nickname", users["nickname"])
+    numbers = ["tdee", "kcal_intake", "g_proteins", "g_fat", "g_carbohydrates"]
+    return plans.round(dict.fromkeys(numbers, 0))
@@ -0,0 +1,229 @@
+"""
+Prebuilt vector index of the nutrition documents used by the retriever tool.
+
+The sources (nutrition tables as .xlsx, web pages saved as .html, notes as
+.txt/.md) are read from a local directory, split into 100-token chunks and
+embedded into a Chroma collection persisted on disk. A manifest keeps the
+content hash of each source and the ids of its chunks: rebuilding skips
+unchanged sources, and only embeds chunks that are not already stored.
+
+    python -m backend.nutrition_index --fetch   # download SOURCE_URLS once
+    python -m backend.nutrition_index           # (re)build the index offline
+
+The chunk splitter counts tokens with tiktoken, whose encoding files are
+downloaded on first use: set TIKTOKEN_CACHE_DIR to a prefilled directory on
+machines without network access.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import urllib.request
+from functools import lru_cache
+from pathlib import Path
+
+from langchain_community.document_loaders import BSHTMLLoader, TextLoader
+from langchain_community.document_loaders.excel import UnstructuredExcelLoader
+from langchain_community.vectorstores import Chroma
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from backend.semantic_cache import embedder_name
+
+DEFAULT_SOURCE_DIR = os.path.join(os.getcwd(), "data", "nutrition_sources")
+DEFAULT_INDEX_DIR = os.path.join(os.getcwd(), "data", "nutrition_index")
+MANIFEST_FILE = "manifest.json"
+COLLECTION_NAME = "rag-chroma"
+SOURCE_URLS = [
+    "https://ai.hubermanlab.com/s/idROLBEo",
+    "https://www.hubermanlab.com/newsletter/foundational-fitness-protocol",
+    "https://www.hubermanlab.com/newsletter/improve-your-sleep",
+]
+CHUNK_SIZE = 100
+CHUNK_OVERLAP = 50
+EMBED_BATCH_SIZE = 256
+
+LOADERS = {
+    ".xlsx": lambda path: UnstructuredExcelLoader(path, mode="elements"),
+    ".html": BSHTMLLoader,
+    ".htm": BSHTMLLoader,
+    ".txt": TextLoader,
+    ".md": TextLoader,
+}
+
+
+def file_sha256(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def chunk_id(source: str, text: str) -> str:
+    """Content address of a chunk: the same text of the same source keeps its id."""
+    return hashlib.sha256(f"{source}\0{text}".encode("utf-8")).hexdigest()
+
+
+def fetch_sources(urls=SOURCE_URLS, source_dir=DEFAULT_SOURCE_DIR):
+    """Save the web sources as .html files of source_dir (the only network step)."""
+    source_dir = Path(source_dir)
+    source_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for url in urls:
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", url.split("://", 1)[-1]).strip("_")
+        path = source_dir / f"{slug}.html"
+        with urllib.request.urlopen(url, timeout=30) as response:
+            path.write_bytes(response.read())
+        paths.append(path)
+    return paths
+
+
+def list_sources(source_dir=DEFAULT_SOURCE_DIR):
+    source_dir = Path(source_dir)
+    if not source_dir.exists():
+        return []
+    return sorted(
+        path
+        for path in source_dir.rglob("*")
+        if path.is_file() and path.suffix.lower() in LOADERS
+    )
+
+
+def split_source(path, source: str, splitter) -> dict:
+    """Chunks of one source file by id, duplicated texts stored once."""
+    docs = LOADERS[Path(path).suffix.lower()](str(path)).load()
+    chunks = {}
+    for chunk in splitter.split_documents(docs):
+        chunk.metadata = {"source": source}
+        chunks.setdefault(chunk_id(source, chunk.page_content), chunk)
+    return chunks
+
+
+def read_manifest(index_dir=DEFAULT_INDEX_DIR) -> dict:
+    path = Path(index_dir) / MANIFEST_FILE
+    if not path.exists():
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def write_manifest(manifest: dict, index_dir=DEFAULT_INDEX_DIR):
+    # Written last and atomically: an interrupted build is resumed, chunks
+    # already embedded are found in the store and not sent again
+    path = Path(index_dir) / MANIFEST_FILE
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+def open_vectorstore(index_dir=DEFAULT_INDEX_DIR, embedding: Embeddings = None):
+    return Chroma(
+        collection_name=COLLECTION_NAME,
+        embedding_function=embedding or OpenAIEmbeddings(),
+        persist_directory=str(index_dir),
+    )
+
+
+def _stored_ids(vectorstore, ids) -> set:
+    if not ids:
+        return set()
+    return {doc.id for doc in vectorstore.get_by_ids(list(ids))}
+
+
+def build_index(
+    source_dir=DEFAULT_SOURCE_DIR,
+    index_dir=DEFAULT_INDEX_DIR,
+    embedding: Embeddings = None,
+    batch_size: int = EMBED_BATCH_SIZE,
+) -> dict:
+    """
+    Update the persisted index with the sources of source_dir: unchanged
+    files are skipped, new chunks are embedded `batch_size` at a time, chunks
+    and sources that disappeared are deleted. Changing the embedding model or
+    the chunking rebuilds everything. Returns counts of what was done.
+    """
+    embedding = embedding or OpenAIEmbeddings()
+    Path(index_dir).mkdir(parents=True, exist_ok=True)
+    vectorstore = open_vectorstore(index_dir, embedding)
+    settings = {
+        "embedding": embedder_name(embedding),
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+    }
+    manifest = read_manifest(index_dir)
+    previous = manifest.get("sources", {})
+    if manifest.get("settings") != settings and previous:
+        # Vectors of another model or chunking: start from an empty collection
+        vectorstore.delete_collection()
+        vectorstore = open_vectorstore(index_dir, embedding)
+        previous = {}
+
+    splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+    )
+    stats = {"sources": 0, "skipped": 0, "embedded": 0, "deleted": 0}
+    sources = {}
+    for path in list_sources(source_dir):
+        source = path.relative_to(source_dir).as_posix()
+        digest = file_sha256(path)
+        stats["sources"] += 1
+        old = previous.get(source)
+        if old is not None and old["sha256"] == digest:
+            sources[source] = old
+            stats["skipped"] += 1
+            continue
+        chunks = split_source(path, source, splitter)
+        # Chunks of an edited file that did not change keep their id and
+        # their embedding, and so do chunks left by an interrupted build
+        stored = _stored_ids(vectorstore, chunks)
+        new_ids = [i for i in chunks if i not in stored]
+        for start in range(0, len(new_ids), batch_size):
+            batch = new_ids[start : start + batch_size]
+            vectorstore.add_documents([chunks[i] for i in batch], ids=batch)
+        stats["embedded"] += len(new_ids)
+        stale = set(old["chunks"]) - chunks.keys() if old else set()
+        if stale:
+            vectorstore.delete(ids=list(stale))
+            stats["deleted"] += len(stale)
+        sources[source] = {"sha256": digest, "chunks": list(chunks)}
+
+    for source in previous.keys() - sources.keys():
+        vectorstore.delete(ids=previous[source]["chunks"])
+        stats["deleted"] += len(previous[source]["chunks"])
+
+    write_manifest({"settings": settings, "sources": sources}, index_dir)
+    return stats
+
+
+@lru_cache(maxsize=None)
+def get_vectorstore(index_dir=DEFAULT_INDEX_DIR):
+    """Persisted store, opened on first use and shared by the whole process."""
+    if not (Path(index_dir) / MANIFEST_FILE).exists():
+        raise FileNotFoundError(
+            f"No nutrition index in {index_dir}, "
+            "build it with: python -m backend.nutrition_index"
+        )
+    return open_vectorstore(index_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sources", default=DEFAULT_SOURCE_DIR)
+    parser.add_argument("--index", default=DEFAULT_INDEX_DIR)
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument(
+        "--fetch", action="store_true", help="download SOURCE_URLS first"
+    )
+    args = parser.parse_args()
+    if args.fetch:
+        for path in fetch_sources(SOURCE_URLS, args.sources):
+            print(f"fetched {path}")
+    stats = build_index(args.sources, args.index, batch_size=args.batch_size)
+    print(
+        f"{stats['sources']} sources ({stats['skipped']} unchanged), "
+        f"{stats['embedded']} chunks embedded, {stats['deleted']} deleted"
+    )
@@ -0,0 +1,302 @@
+"""
+Semantic cache of the nutritionist answers: a question close enough (cosine
+similarity of the embeddings) to one already answered for the same profile
+gets the stored diet plan, cookbook and response instead of three LLM calls.
+Entries live in a local SQLite file and are loaded per profile into an
+in-memory matrix of normalized embeddings.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_SEMANTIC_CACHE_PATH = os.path.join(
+    os.getcwd(), "data", "cache", "nutrition_answers.sqlite"
+)
+
+
+def profile_key(profile: dict, namespace: str = "") -> str:
+    """
+    Hash of everything but the question that the answer depends on (user
+    profile, goal...), with the embedding model as namespace: vectors of two
+    models are never compared.
+    """
+    h = hashlib.sha256()
+    for part in (json.dumps(profile, sort_keys=True, default=str), namespace):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _normalize(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class HashingEmbedder(Embeddings):
+    """
+    Local, deterministic embedder: words and word pairs hashed into `dim`
+    signed buckets. No model nor network, for tests, benchmarks and offline
+    runs; it only sees shared words, not synonyms.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _features(self, text: str):
+        words = re.findall(r"\w+", text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def _vector(self, text: str) -> list:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            h = int.from_bytes(
+                hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(),
+                "little",
+            )
+            vector[h % self.dim] += 1.0 if h >> 63 else -1.0
+        return _normalize(vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+def embedder_name(embedder: Embeddings) -> str:
+    model = getattr(embedder, "model", None) or getattr(embedder, "dim", "")
+    return f"{type(embedder).__name__}:{model}"
+
+
+@dataclass
+class CacheLookup:
+    """Result of SemanticCache.lookup, handed back to store() on a miss."""
+
+    key: str
+    vector: np.ndarray
+    question: str
+    value: dict = None
+    similarity: float = 0.0
+
+    @property
+    def hit(self) -> bool:
+        return self.value is not None
+
+
+class _ProfileIndex:
+    # Normalized embeddings of one profile's cached questions, one row each
+    def __init__(self, dim):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self.created = np.empty(0, dtype=np.float64)
+        self.latency = np.empty(0, dtype=np.float64)
+
+    def append(self, row_id, vector, created, latency):
+        self.ids = np.append(self.ids, row_id)
+        self.vectors = np.vstack([self.vectors, vector[None, :]])
+        self.created = np.append(self.created, created)
+        self.latency = np.append(self.latency, latency)
+
+    def keep(self, mask):
+        self.ids = self.ids[mask]
+        self.vectors = self.vectors[mask]
+        self.created = self.created[mask]
+        self.latency = self.latency[mask]
+
+
+class SemanticCache:
+    """
+    Answers cached by profile and question embedding. A lookup is a hit when
+    an entry of the same profile younger than `ttl` seconds has a cosine
+    similarity of at least `threshold` with the question. At most
+    `max_entries` answers are kept per profile, the oldest are dropped first.
+    `path=None` keeps the cache in memory only.
+
+    `threshold` depends on the embedder: ~0.9 suits OpenAI embeddings, where
+    paraphrases land close together; the word-based HashingEmbedder needs
+    lower values.
+    """
+
+    def __init__(
+        self,
+        embedder: Embeddings = None,
+        path=DEFAULT_SEMANTIC_CACHE_PATH,
+        threshold: float = 0.9,
+        ttl: float = 7 * 24 * 3600,
+        max_entries: int = 256,
+    ):
+        if embedder is None:
+            from langchain_openai import OpenAIEmbeddings
+
+            embedder = OpenAIEmbeddings(model="text-embedding-3-small")
+        self.embedder = embedder
+        self.namespace = embedder_name(embedder)
+        self.path = None if path is None else Path(path)
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+        self.lookup_time = 0.0
+        self._lock = threading.Lock()
+        self._indexes = {}
+        self._values = {}
+        self._next_id = 0
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS answers (
+                        id INTEGER PRIMARY KEY,
+                        profile TEXT NOT NULL,
+                        question TEXT NOT NULL,
+                        embedding BLOB NOT NULL,
+                        value TEXT NOT NULL,
+                        latency REAL NOT NULL,
+                        created REAL NOT NULL
+                    )
+                    """
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS answers_profile ON answers (profile)"
+                )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _index(self, key: str, dim: int) -> _ProfileIndex:
+        # Loaded from the file on the first lookup of a profile, then kept in
+        # memory and updated by store()
+        index = self._indexes.get(key)
+        if index is not None:
+            return index
+        index = _ProfileIndex(dim)
+        if self.path is not None:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT id, embedding, value, latency, created FROM answers "
+                    "WHERE profile = ? AND created >= ? ORDER BY created",
+                    (key, time.time() - self.ttl),
+                ).fetchall()
+            for row_id, embedding, value, latency, created in rows:
+                vector = np.frombuffer(embedding, dtype=np.float32)
+                if vector.shape[0] != dim:
+                    continue
+                index.append(row_id, vector, created, latency)
+                self._values[row_id] = json.loads(value)
+        self._indexes[key] = index
+        return index
+
+    def lookup(self, profile: dict, question: str) -> CacheLookup:
+        """Closest live answer of `profile` to `question`, if close enough."""
+        start = time.perf_counter()
+        key = profile_key(profile, self.namespace)
+        vector = _normalize(self.embedder.embed_query(question))
+        lookup = CacheLookup(key=key, vector=vector, question=question)
+        with self._lock:
+            index = self._index(key, vector.shape[0])
+            if len(index.ids):
+                similarity = index.vectors @ vector
+                similarity[index.created < time.time() - self.ttl] = -np.inf
+                best = int(np.argmax(similarity))
+                if similarity[best] >= self.threshold:
+                    lookup.value = self._values[int(index.ids[best])]
+                    lookup.similarity = float(similarity[best])
+            elapsed = time.perf_counter() - start
+            self.lookup_time += elapsed
+            if lookup.hit:
+                self.hits += 1
+                self.latency_saved += max(float(index.latency[best]) - elapsed, 0.0)
+            else:
+                self.misses += 1
+        return lookup
+
+    def store(self, lookup: CacheLookup, value: dict, latency: float = 0.0):
+        """
+        Cache the answer of a missed lookup. `latency` is what it cost to
+        generate, counted as saved on each later hit.
+        """
+        now = time.time()
+        with self._lock:
+            index = self._index(lookup.key, lookup.vector.shape[0])
+            if self.path is None:
+                row_id = self._next_id
+                self._next_id += 1
+            else:
+                with self._connect() as conn:
+                    row_id = conn.execute(
+                        "INSERT INTO answers "
+                        "(profile, question, embedding, value, latency, created) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (
+                            lookup.key,
+                            lookup.question,
+                            lookup.vector.tobytes(),
+                            json.dumps(value),
+                            latency,
+                            now,
+                        ),
+                    ).lastrowid
+            index.append(row_id, lookup.vector, now, latency)
+            self._values[row_id] = value
+            self._evict(lookup.key, index, now)
+
+    def _evict(self, key, index, now):
+        # Expired entries first, then the oldest beyond max_entries
+        keep = index.created >= now - self.ttl
+        keep &= np.cumsum(keep[::-1])[::-1] <= self.max_entries
+        if keep.all():
+            return
+        dropped = [int(row_id) for row_id in index.ids[~keep]]
+        index.keep(keep)
+        for row_id in dropped:
+            del self._values[row_id]
+        if self.path is not None:
+            with self._connect() as conn:
+                conn.executemany(
+                    "DELETE FROM answers WHERE id = ?", [(i,) for i in dropped]
+                )
+                conn.execute(
+                    "DELETE FROM answers WHERE profile = ? AND created < ?",
+                    (key, now - self.ttl),
+                )
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+            self._values.clear()
+            if self.path is not None:
+                with self._connect() as conn:
+                    conn.execute("DELETE FROM answers")
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = sum(len(index.ids) for index in self._indexes.values())
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0.0,
+            "entries": entries,
+            "latency_saved": self.latency_saved,
+            "mean_lookup_ms": self.lookup_time / requests * 1000 if requests else 0.0,
+        }
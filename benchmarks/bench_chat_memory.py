@@ -0,0 +1,124 @@
+"""
+Per-turn latency of the nutritionist over a long chat session, against a stub
+LLM whose time to first token grows with the prompt (prefill): the whole
+history in the prompt (previous behaviour) vs. ChatMemory (last turns verbatim,
+older ones summarized).
+
+Run from the repository root: python -m benchmarks.bench_chat_memory
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import tiktoken
+
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from backend.agents_llm.nutritionist import NutritionPipeline
+from backend.chat_memory import get_encoding
+from backend.nutrition_engine import diet_plan_numbers
+from benchmarks.bench_nutrition_streaming import STUB_USER
+from benchmarks.stub_llm import STUB_RESPONSE, LatencyChatModel
+
+QUESTIONS = [
+    "I want to lose some fat",
+    "Can I still eat pasta at night?",
+    "What about a cheat meal on Sunday?",
+    "I train 4 times a week, is it enough proteins?",
+    "Give me a vegetarian option for lunch",
+]
+
+
+def load_encoding():
+    # tiktoken downloads its BPE files on first use: count bytes offline,
+    # with budgets scaled by ~4 bytes per BPE token
+    try:
+        return get_encoding(), 1
+    except Exception:
+        print("tiktoken encodings unavailable offline, counting bytes")
+        encoding = tiktoken.Encoding(
+            name="bytes",
+            pat_str=r"[\s\S]",
+            mergeable_ranks={bytes([i]): i for i in range(256)},
+            special_tokens={},
+        )
+        return encoding, 4
+
+
+def run_session(pipeline, n_turns, memory=None):
+    diet_plan = diet_plan_numbers(STUB_USER, "lose")
+    history = []
+    latencies, summarize = [], []
+    prompt_chars = []
+    for turn in range(n_turns):
+        question = QUESTIONS[turn % len(QUESTIONS)]
+        state = {
+            "user_info": STUB_USER,
+            "question": question,
+            "chat_history": memory.messages() if memory else history,
+            "diet_plan": diet_plan,
+        }
+        prompt_chars.append(sum(len(m.content) for m in state["chat_history"]))
+        start = time.perf_counter()
+        pipeline.nutritionist_chain.invoke(state)
+        latencies.append(time.perf_counter() - start)
+        # The app stores the final response of each turn
+        start = time.perf_counter()
+        if memory:
+            memory.add_turn(question, STUB_RESPONSE)
+        else:
+            history += [HumanMessage(content=question), AIMessage(content=STUB_RESPONSE)]
+        summarize.append(time.perf_counter() - start)
+    return np.array(latencies), np.array(summarize), np.array(prompt_chars)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    # 50k prompt tokens/s of prefill
+    parser.add_argument("--prompt-latency", type=float, default=2e-5)
+    args = parser.parse_args()
+
+    llm = LatencyChatModel(
+        latency=args.latency,
+        token_latency=args.token_latency,
+        prompt_latency=args.prompt_latency,
+    )
+    pipeline = NutritionPipeline(llm=llm)
+    encoding, scale = load_encoding()
+    memory = pipeline.new_memory(
+        encoding=encoding,
+        max_history_tokens=1500 * scale,
+        max_summary_tokens=250 * scale,
+    )
+
+    full, _, full_chars = run_session(pipeline, args.turns)
+    bounded, summarize, bounded_chars = run_session(pipeline, args.turns, memory)
+
+    print(
+        f"stub LLM: {args.latency:.2f} s latency, "
+        f"{args.prompt_latency * 1e6:.0f} us/prompt token, {args.turns} turns"
+    )
+    print("turn | full history: latency  history chars | memory: latency  chars")
+    for turn in sorted({1, 10, 25, 50, 75, args.turns}):
+        if turn > args.turns:
+            continue
+        i = turn - 1
+        print(
+            f"{turn:4d} | {full[i]:20.3f} s {full_chars[i]:14,d} | "
+            f"{bounded[i]:13.3f} s {bounded_chars[i]:6,d}"
+        )
+    print(
+        f"total: full history {full.sum():.2f} s, memory {bounded.sum():.2f} s "
+        f"+ {summarize.sum():.2f} s of summaries after the answers "
+        f"(last memory size: {memory.tokens // scale} tokens)"
+    )
+
+
+if __name__ == "__main__":
+    main()
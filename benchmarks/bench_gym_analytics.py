@@ -0,0 +1,55 @@
+"""
+Measure how the gym-wide analytics runner scales with the number of worker
+processes, on a temporary directory of synthetic per-user CSV logs.
+
+Run from the repository root: python -m benchmarks.bench_gym_analytics
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import make_workout_log
+from src.workout_log.gym_analytics import run_gym_analytics
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=64)
+    parser.add_argument("--sets", type=int, default=20_000, help="sets per user")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=sorted({1, 2, 4, os.cpu_count() or 1}),
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as logs_dir:
+        for i in range(args.users):
+            make_workout_log(args.sets, seed=i).to_csv(
+                os.path.join(logs_dir, f"user{i:03d}.csv"), index=False
+            )
+
+        print(f"{args.users} users x {args.sets:,} sets, {os.cpu_count()} cores")
+        baseline = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            tables = run_gym_analytics(logs_dir, max_workers=workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(
+                f"{workers:2d} workers: {elapsed:7.2f} s "
+                f"(speedup {baseline / elapsed:.1f}x)"
+            )
+
+        timings = tables["timings"]
+        print(
+            "per user: load {:.3f} s, compute {:.3f} s (median)".format(
+                timings["Load (s)"].median(), timings["Compute (s)"].median()
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Time, bytes sent and (optionally) parse accuracy of the image preprocessing
+settings used before sending workout notes to the MLLM.
+
+Run from the repository root:
+    python -m benchmarks.bench_image_preprocessing [--fixtures DIR] [--parse]
+
+DIR holds photos of workout notes; a <name>.json file next to <name>.jpg with
+the expected Workout enables accuracy scoring with --parse (which calls the
+real model, so it needs OPENAI_API_KEY). Without DIR, synthetic notes are
+rendered at phone and small-screenshot resolutions (no accuracy).
+"""
+import argparse
+import base64
+import io
+import json
+import time
+from collections import Counter
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+from src.workout_log.image_preprocessing import preprocess_image_for_ocr
+from src.workout_log.workout_parser import preprocess_image
+
+SETTINGS = {
+    "scale 0.1, q75 (legacy app)": lambda img: preprocess_image(img, 0.1, 75),
+    "scale 0.5, q100 (legacy default)": lambda img: preprocess_image(img, 0.5, 100),
+    "budget 100kB": lambda img: preprocess_image_for_ocr(img, byte_budget=100_000),
+    "budget 250kB": lambda img: preprocess_image_for_ocr(img, byte_budget=250_000),
+    "budget 250kB, crop": lambda img: preprocess_image_for_ocr(
+        img, byte_budget=250_000, crop_text=True
+    ),
+    "budget 250kB, color": lambda img: preprocess_image_for_ocr(
+        img, byte_budget=250_000, grayscale=False
+    ),
+}
+
+
+def synthetic_notes(size):
+    img = Image.new("RGB", size, (236, 231, 220))
+    draw = ImageDraw.Draw(img)
+    lines = ["PUSH DAY 12-03-2024", "DC 4*8 80kg", "DI 12/10/10 60kg", "Dips pdc 3*12"]
+    font_size = max(10, size[1] // 30)
+    for i, line in enumerate(lines):
+        draw.text(
+            (size[0] // 5, size[1] // 4 + i * font_size * 2),
+            line,
+            fill=(35, 35, 70),
+            font_size=font_size,
+        )
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=92)
+    return buffer.getvalue()
+
+
+def load_fixtures(fixtures_dir):
+    fixtures = []
+    for path in sorted(Path(fixtures_dir).iterdir()):
+        if path.suffix.lower() not in (".jpg", ".jpeg", ".png"):
+            continue
+        truth = path.with_suffix(".json")
+        expected = json.loads(truth.read_text()) if truth.is_file() else None
+        fixtures.append((path.name, path.read_bytes(), expected))
+    return fixtures
+
+
+def set_f1(parsed, expected):
+    """F1 score of the parsed sets against the expected ones."""
+
+    def sets(workout):
+        return Counter(
+            (s["exercice"]["name"], s["nb_reps"], float(s["charge"] or 0))
+            for s in workout["sets"]
+        )
+
+    found, truth = sets(parsed), sets(expected)
+    matched = sum((found & truth).values())
+    if matched == 0:
+        return 0.0
+    precision = matched / sum(found.values())
+    recall = matched / sum(truth.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fixtures", type=str, default=None)
+    parser.add_argument("--parse", action="store_true")
+    args = parser.parse_args()
+
+    if args.fixtures:
+        fixtures = load_fixtures(args.fixtures)
+    else:
+        fixtures = [
+            ("phone 4032x3024", synthetic_notes((4032, 3024)), None),
+            ("small 800x600", synthetic_notes((800, 600)), None),
+        ]
+
+    logger = None
+    if args.parse:
+        from src.workout_log.workout_parser import WorkoutLogger
+
+        logger = WorkoutLogger(use_cache=False)
+        chain = logger.setup_chain(mode="mllm")
+
+    print(f"{'setting':34} {'ms/img':>8} {'kB/img':>8} {'last size':>11} {'F1':>6}")
+    for name, preprocess in SETTINGS.items():
+        elapsed, n_bytes, scores, size = 0.0, 0, [], None
+        for _, raw, expected in fixtures:
+            start = time.perf_counter()
+            img = preprocess(raw)
+            elapsed += time.perf_counter() - start
+            data = base64.b64decode(img)
+            n_bytes += len(data)
+            size = Image.open(io.BytesIO(data)).size
+            if logger is not None and expected is not None:
+                scores.append(set_f1(chain.invoke({"input_img": img}), expected))
+        f1 = f"{sum(scores) / len(scores):.2f}" if scores else "-"
+        print(
+            f"{name:34} {elapsed / len(fixtures) * 1000:8.1f} "
+            f"{n_bytes / len(fixtures) / 1000:8.1f} {f'{size[0]}x{size[1]}':>11} {f1:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
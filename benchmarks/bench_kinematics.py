@@ -0,0 +1,53 @@
+"""
+Time the kinematics module on synthetic squat trajectories.
+
+Run from the repository root: python -m benchmarks.bench_kinematics
+"""
+import argparse
+import time
+
+from benchmarks.synthetic_poses import squat_keypoints
+from src.pose_estimation.kinematics import (
+    analyse_squat,
+    bar_path,
+    joint_angles,
+    velocity,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'frames':>8} {'angles':>9} {'bar path':>9} {'velocity':>9} {'squat':>9} {'reps':>5}")
+    for n_frames in (1_000, 10_000, 100_000):
+        keypoints = squat_keypoints(n_frames, fps=args.fps)
+        timings = {}
+        for name, fn in {
+            "angles": lambda: joint_angles(keypoints),
+            "bar path": lambda: bar_path(keypoints, "squat"),
+            "velocity": lambda: velocity(bar_path(keypoints, "squat")[:, 1], args.fps),
+            "squat": lambda: analyse_squat(keypoints, args.fps),
+        }.items():
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                result = fn()
+                best = min(best, time.perf_counter() - start)
+            timings[name] = best
+        reps = result
+        print(
+            f"{n_frames:>8} "
+            + " ".join(f"{timings[name] * 1000:7.2f}ms" for name in timings)
+            + f" {len(reps['bottom']):>5}"
+        )
+    print(
+        f"last run: depth ok {reps['depth_ok'].mean():.0%}, "
+        f"lockout ok {reps['lockout_ok'].mean():.0%}"
+    )
+
+
+if __name__ == "__main__":
+    main()
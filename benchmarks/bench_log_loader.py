@@ -0,0 +1,66 @@
+"""
+Compare loading a synthetic 1M-set CSV log with a plain pd.read_csv against the
+typed loader (C and pyarrow engines), including the weekly sets per muscle
+computed from the loaded frame, and the cost of the signature check done on
+cached reruns.
+
+Run from the repository root: python -m benchmarks.bench_log_loader
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import make_workout_log
+from src.workout_log.log_loader import log_signature, read_log_csv
+from src.workout_log.perf_analysis import (
+    exercise_to_muscle_map,
+    sets_per_muscle_per_week,
+)
+
+
+def timeit(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sets", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "log.csv")
+        make_workout_log(args.sets).to_csv(path, index=False)
+        print(f"{args.sets:,} sets, {os.path.getsize(path) / 2**20:.0f} MB CSV")
+
+        loaders = {
+            "pd.read_csv": lambda: pd.read_csv(path),
+            "typed, c": lambda: read_log_csv(path, engine="c"),
+            "typed, pyarrow": lambda: read_log_csv(path, engine="pyarrow"),
+        }
+        for name, load in loaders.items():
+            load_time, df = timeit(load, args.repeat)
+            weekly_time, _ = timeit(
+                lambda: sets_per_muscle_per_week(df, exercise_to_muscle_map),
+                args.repeat,
+            )
+            memory = df.memory_usage(deep=True).sum() / 2**20
+            print(
+                f"{name:15s}: load {load_time * 1000:7.1f} ms, "
+                f"weekly sets {weekly_time * 1000:7.1f} ms, {memory:6.1f} MB"
+            )
+
+        signature_time, _ = timeit(lambda: log_signature(path), args.repeat)
+        print(f"cached rerun (signature check): {signature_time * 1e6:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
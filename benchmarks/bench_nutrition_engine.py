@@ -0,0 +1,65 @@
+"""
+Time the local diet plan calculator: one plan per call (the diet_calculator
+node) and the vectorized bulk mode over a synthetic population shaped like
+data/users.json, against a loop of single-user calls.
+
+Run from the repository root: python -m benchmarks.bench_nutrition_engine
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from backend.nutrition_engine import bulk_diet_plans, diet_plan_numbers, load_users
+
+
+def make_users(n_users, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "nickname": [f"user{i}" for i in range(n_users)],
+            "age": rng.integers(18, 70, n_users),
+            "gender": rng.choice(["M", "F"], n_users),
+            "height": rng.integers(150, 200, n_users),
+            "weight": rng.integers(45, 120, n_users),
+            "activity_factor": rng.choice([1.2, 1.3, 1.5, 1.7, 1.9], n_users),
+        }
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--loop-users", type=int, default=10_000)
+    args = parser.parse_args()
+
+    user = load_users().iloc[0].to_dict()
+    calls = 10_000
+    start = time.perf_counter()
+    for _ in range(calls):
+        diet_plan_numbers(user, "lose")
+    single = (time.perf_counter() - start) / calls
+
+    users = make_users(args.users)
+    goals = np.random.default_rng(1).choice(["lose", "maintain", "gain"], args.users)
+    start = time.perf_counter()
+    bulk_diet_plans(users, goals)
+    bulk = time.perf_counter() - start
+
+    records = users.head(args.loop_users).to_dict("records")
+    start = time.perf_counter()
+    for record, goal in zip(records, goals):
+        diet_plan_numbers(record, goal)
+    loop = (time.perf_counter() - start) / len(records)
+
+    print(f"single plan        : {single * 1e6:8.1f} us")
+    print(f"loop, per user     : {loop * 1e6:8.1f} us")
+    print(
+        f"bulk, {args.users:,} users: {bulk * 1000:8.1f} ms "
+        f"({bulk / args.users * 1e6:.2f} us per user)"
+    )
+
+
+if __name__ == "__main__":
+    main()
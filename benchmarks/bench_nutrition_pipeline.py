@@ -0,0 +1,105 @@
+"""
+Wall-clock time of the nutrition pipeline against a latency-injecting stub LLM:
+the previous strict chain (prompts and parsers rebuilt in every node, diet plan
+numbers computed by the LLM, one cook call for the three meals) vs. the current
+graph (precompiled chains, numbers computed locally, then the explanation and
+one cook branch per meal run in parallel).
+
+Run from the repository root: python -m benchmarks.bench_nutrition_pipeline
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+from langchain.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import JsonOutputParser
+
+from backend.agents_llm.nutritionist import (
+    FINAL_RESPONSE_TEMPLATE,
+    NutritionPipeline,
+)
+from backend.models import CookBook, DietPlanReport
+from benchmarks.bench_nutrition_streaming import initial_state
+from benchmarks.stub_llm import LatencyChatModel
+
+LEGACY_NUTRITIONIST_SYSTEM = """
+        You are AI-BRO diet planner. To make a diet plan, follow these steps: \n
+        1. Consider past info from the user :{user_info}\n
+        2. Understand the user challenge : {question}\n
+        3. Determine the strategy to take. What does he have to change in his diet?
+        4. Then, proceed this way:
+        4.1 Calculate total daily energy expenditure with the information you have\n
+        4.2 Take a calorie deficit/surplus of 5-10 percent of total energy expenditure, depending on user's goal, \
+        and determine the total kcal intake. \n
+        4.3 Deduce macronutrients quantities per day. 1g of proteins or carbs is 4kcal and 1g of fat is 9 kcal, \
+        the user needs 1g of fat/kg of bodyweight, 1 to 2g of proteins/kg of bodyweight (1 if sedentary, 2 if very sportive) and the rest in carbohydrates.\n
+        4.4 Make your results in a structured output following : {format_instructions}. \n
+        Context of conversation: {chat_history}\n
+        Go on ! \n
+        """
+LEGACY_COOK_SYSTEM = """
+        You are AI-BRO cook. To create meals , follow these steps: \n
+        1. Consider diet plan :{diet_plan}\n
+        2. Analyze user profile : {user_info}\n
+        3. Build three meals : breakfast, lunch and diner to fit the diet plan and respect macronutrients and kcals.\n
+        4. Put your meals in a cookbook using a structured output, following : {format_instructions}. \n
+        Go on ! \n
+        """
+
+
+def legacy_run(llm, state):
+    # Previous pipeline: sequential nodes, each building its prompt and parser
+    parser = JsonOutputParser(pydantic_object=DietPlanReport)
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", LEGACY_NUTRITIONIST_SYSTEM),
+            ("placeholder", "{chat_history}"),
+            ("human", "{question}"),
+        ]
+    ).partial(format_instructions=parser.get_format_instructions())
+    state["diet_plan"] = (prompt | llm | parser).invoke(state)
+
+    parser = JsonOutputParser(pydantic_object=CookBook)
+    prompt = ChatPromptTemplate.from_template(template=LEGACY_COOK_SYSTEM).partial(
+        format_instructions=parser.get_format_instructions()
+    )
+    state["cookbook"] = (prompt | llm | parser).invoke(state)
+
+    prompt = ChatPromptTemplate.from_template(FINAL_RESPONSE_TEMPLATE)
+    state["response"] = (prompt | llm).invoke(state).content
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--token-latency", type=float, default=0.02)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    llm = LatencyChatModel(latency=args.latency, token_latency=args.token_latency)
+    pipeline = NutritionPipeline(llm=llm)
+    workflow = pipeline.pipeline()
+
+    def best_of(fn):
+        best = float("inf")
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    legacy = best_of(lambda: legacy_run(llm, initial_state()))
+    parallel = best_of(lambda: workflow.invoke(initial_state()))
+    print(
+        f"stub LLM: {args.latency:.2f} s latency, "
+        f"{args.token_latency * 1000:.0f} ms/token"
+    )
+    print(f"sequential chain : {legacy:6.2f} s")
+    print(f"parallel cooks   : {parallel:6.2f} s (-{1 - parallel / legacy:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Time-to-first-content of the nutrition pipeline against a stub LLM with remote
+latency: blocking invoke (previous chat UI, nothing shown before the end)
+vs. stream_response (diet plan, cookbook, then final answer token by token).
+
+Run from the repository root: python -m benchmarks.bench_nutrition_streaming
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+from backend.agents_llm.nutritionist import NutritionPipeline
+from backend.models import State
+from benchmarks.stub_llm import LatencyChatModel
+
+STUB_USER = {
+    "nickname": "stub",
+    "age": 30,
+    "gender": "M",
+    "height": 178,
+    "weight": 80,
+    "activity_factor": 1.5,
+    "regime": "omnivore",
+}
+
+
+def initial_state():
+    return State(
+        user_info=STUB_USER,
+        question="I want to lose some fat",
+        chat_history=[],
+        diet_plan=None,
+        cookbook=None,
+        response="",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    args = parser.parse_args()
+
+    llm = LatencyChatModel(latency=args.latency, token_latency=args.token_latency)
+    pipeline = NutritionPipeline(llm=llm)
+    workflow = pipeline.pipeline()
+
+    start = time.perf_counter()
+    workflow.invoke(initial_state())
+    blocking = time.perf_counter() - start
+
+    timings = {}
+    n_tokens = sum(
+        kind == "token"
+        for kind, _ in pipeline.stream_response(workflow, initial_state(), timings)
+    )
+
+    print(
+        f"stub LLM: {args.latency:.2f} s latency, "
+        f"{args.token_latency * 1000:.0f} ms/token"
+    )
+    print(f"invoke, first content     : {blocking:6.2f} s")
+    for key in ["first_content", "diet_plan", "cookbook", "first_token", "total"]:
+        print(f"stream, {key:18s}: {timings[key]:6.2f} s")
+    print(f"final response streamed in {n_tokens} chunks")
+
+
+if __name__ == "__main__":
+    main()
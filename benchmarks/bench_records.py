@@ -0,0 +1,53 @@
+"""
+Compare drawing the progress of every lift with modified_exercise_tracker (one
+full scan of the log per lift) against the PersonalRecords index (one groupby
+pass, then a dict lookup per lift), and time an incremental update.
+
+Run from the repository root: python -m benchmarks.bench_records
+"""
+import argparse
+import time
+
+from benchmarks.synthetic import make_workout_log
+from src.workout_log.perf_analysis import modified_exercise_tracker
+from src.workout_log.records import PersonalRecords
+
+
+def timeit(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sets", type=int, default=1_000_000)
+    parser.add_argument("--new-sets", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_workout_log(args.sets)
+    pairs = df[["Exercise name", "Equipment"]].drop_duplicates().to_numpy()
+
+    scan_time, _ = timeit(
+        lambda: [modified_exercise_tracker(df, *pair) for pair in pairs], args.repeat
+    )
+    build_time, records = timeit(lambda: PersonalRecords.build(df), args.repeat)
+    lookup_time, _ = timeit(
+        lambda: [records.history(*lift) for lift in records.lifts()], args.repeat
+    )
+    new_sets = make_workout_log(args.new_sets, seed=1)
+    update_time, _ = timeit(lambda: records.update(new_sets), args.repeat)
+
+    print(f"{args.sets:,} sets, {len(pairs)} exercise/equipment pairs")
+    print(f"tracker, all lifts : {scan_time * 1000:8.1f} ms")
+    print(f"index build        : {build_time * 1000:8.1f} ms")
+    print(f"index, all lifts   : {lookup_time * 1000:8.3f} ms")
+    print(f"update, {args.new_sets} sets    : {update_time * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
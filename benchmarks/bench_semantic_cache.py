@@ -0,0 +1,87 @@
+"""
+Nutritionist chat with and without the semantic answer cache, against a
+latency-injecting stub LLM and the local HashingEmbedder: a stream of questions
+drawn from a few families of paraphrases ("I want to bulk", "I want to bulk
+up"...) asked by the same user, as in the chat.
+
+Run from the repository root: python -m benchmarks.bench_semantic_cache
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+from backend.agents_llm.nutritionist import NutritionPipeline
+from backend.semantic_cache import HashingEmbedder, SemanticCache
+from benchmarks.bench_nutrition_streaming import initial_state
+from benchmarks.stub_llm import LatencyChatModel
+
+QUESTION_FAMILIES = [
+    ["I want to bulk", "I want to bulk up", "I want to bulk this winter"],
+    ["I want to lose fat", "I want to lose some fat", "I want to lose fat fast"],
+    ["I want to cut for summer", "I want to cut", "cut for summer please"],
+    [
+        "what should I eat to stay in shape",
+        "what should I eat to stay in shape?",
+        "What should I eat to stay in good shape",
+    ],
+]
+
+
+def make_questions(n_requests, seed=0):
+    rng = np.random.default_rng(seed)
+    families = rng.integers(0, len(QUESTION_FAMILIES), n_requests)
+    return [QUESTION_FAMILIES[f][rng.integers(0, 3)] for f in families]
+
+
+def run(pipeline, questions):
+    workflow = pipeline.pipeline()
+    latencies = []
+    for question in questions:
+        state = initial_state()
+        state["question"] = question
+        timings = {}
+        for _ in pipeline.stream_response(workflow, state, timings):
+            pass
+        latencies.append(timings["total"])
+    return np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--token-latency", type=float, default=0.002)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    args = parser.parse_args()
+
+    llm = LatencyChatModel(latency=args.latency, token_latency=args.token_latency)
+    questions = make_questions(args.requests)
+    start = time.perf_counter()
+    uncached = run(NutritionPipeline(llm=llm), questions)
+    uncached_total = time.perf_counter() - start
+
+    cache = SemanticCache(HashingEmbedder(), path=None, threshold=args.threshold)
+    start = time.perf_counter()
+    cached = run(NutritionPipeline(llm=llm, cache=cache), questions)
+    cached_total = time.perf_counter() - start
+    stats = cache.stats()
+
+    print(
+        f"stub LLM: {args.latency:.2f} s latency, "
+        f"{args.token_latency * 1000:.0f} ms/token, {args.requests} requests"
+    )
+    print(f"no cache   : {uncached_total:6.2f} s ({uncached.mean():.3f} s/request)")
+    print(f"with cache : {cached_total:6.2f} s ({cached.mean():.3f} s/request)")
+    print(
+        f"hit rate {stats['hit_rate']:.0%} ({stats['hits']}/{args.requests}), "
+        f"{stats['entries']} entries, latency saved {stats['latency_saved']:.2f} s, "
+        f"lookup {stats['mean_lookup_ms']:.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
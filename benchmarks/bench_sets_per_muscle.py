@@ -0,0 +1,73 @@
+"""
+Compare the legacy per-exercise loop of sets_per_muscle_per_week with the
+vectorized single-pass version on a synthetic 1M-set log.
+
+Run from the repository root: python -m benchmarks.bench_sets_per_muscle
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import make_workout_log
+from src.workout_log.perf_analysis import (
+    exercise_to_muscle_map,
+    sets_per_muscle_per_week,
+)
+
+
+def legacy_sets_per_muscle_per_week(df, exercise_to_muscle_map):
+    # Previous implementation, kept here as the baseline (mutates df)
+    df["Date"] = pd.to_datetime(df["Date"], format="%d-%m-%Y")
+    df["Week"] = df["Date"].dt.isocalendar().week
+    df["Year"] = df["Date"].dt.year
+
+    weekly_sets = {}
+    for exercise, muscles in exercise_to_muscle_map.items():
+        exercise_sets = (
+            df[df["Exercise name"] == exercise].groupby(["Year", "Week"]).size()
+        )
+        for muscle in muscles:
+            if muscle not in weekly_sets:
+                weekly_sets[muscle] = exercise_sets
+            else:
+                weekly_sets[muscle] = weekly_sets[muscle].add(
+                    exercise_sets, fill_value=0
+                )
+    return pd.DataFrame(weekly_sets).fillna(0).astype(int)
+
+
+def timeit(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sets", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_workout_log(args.sets)
+    legacy_time, legacy = timeit(
+        lambda: legacy_sets_per_muscle_per_week(df.copy(), exercise_to_muscle_map),
+        args.repeat,
+    )
+    new_time, new = timeit(
+        lambda: sets_per_muscle_per_week(df, exercise_to_muscle_map), args.repeat
+    )
+
+    pd.testing.assert_frame_equal(
+        legacy.sort_index(), new, check_dtype=False, check_index_type=False
+    )
+    print(f"{args.sets:,} sets, {len(exercise_to_muscle_map)} exercises")
+    print(f"legacy     : {legacy_time * 1000:8.1f} ms")
+    print(f"vectorized : {new_time * 1000:8.1f} ms ({legacy_time / new_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Throughput and identity switches of the pose tracker on synthetic crowds.
+
+Run from the repository root: python -m benchmarks.bench_tracking
+"""
+import argparse
+import time
+
+from benchmarks.synthetic_poses import crowd_sequence
+from src.pose_estimation.tracking import PoseTracker
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=3000)
+    args = parser.parse_args()
+
+    print(f"{'people':>6} {'frames/s':>9} {'ms/frame':>9} {'id switches':>12}")
+    for n_people in (1, 3, 5, 10):
+        sequence = list(crowd_sequence(args.frames, n_people))
+        tracker = PoseTracker()
+        assigned, switches = {}, 0
+        start = time.perf_counter()
+        for frame_index, boxes, keypoints, true_ids in sequence:
+            track_ids = tracker.update(frame_index, boxes, keypoints)
+            for true_id, track_id in zip(true_ids, track_ids):
+                if track_id < 0:
+                    continue
+                if assigned.setdefault(true_id, track_id) != track_id:
+                    switches += 1
+                    assigned[true_id] = track_id
+        elapsed = time.perf_counter() - start
+        print(
+            f"{n_people:>6} {args.frames / elapsed:>9.0f} "
+            f"{elapsed / args.frames * 1000:>9.3f} {switches:>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Time the training-load analytics (weekly tonnage and sets, relative intensity,
+ACWR, monotony and strain per muscle) on a synthetic multi-user, multi-year
+log of 10M sets, with dates already parsed as when read from the log store.
+
+Run from the repository root: python -m benchmarks.bench_training_load
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import EQUIPMENTS
+from src.workout_log.perf_analysis import exercise_to_muscle_map
+from src.workout_log.training_load import TrainingLoad
+
+
+def make_multi_user_log(n_sets, n_users, n_days=3 * 365, seed=0):
+    # Same columns as make_workout_log, built with categoricals and datetimes
+    # directly: formatting 10M date strings would dominate the benchmark
+    rng = np.random.default_rng(seed)
+    exercises = list(exercise_to_muscle_map)
+    return pd.DataFrame(
+        {
+            "User": pd.Categorical.from_codes(
+                rng.integers(0, n_users, n_sets), [f"user{i}" for i in range(n_users)]
+            ),
+            "Date": pd.Timestamp("2022-01-01")
+            + pd.to_timedelta(rng.integers(0, n_days, n_sets), unit="D"),
+            "Exercise name": pd.Categorical.from_codes(
+                rng.integers(0, len(exercises), n_sets), exercises
+            ),
+            "Equipment": pd.Categorical.from_codes(
+                rng.integers(0, len(EQUIPMENTS), n_sets), EQUIPMENTS
+            ),
+            "Execution mode": pd.Categorical.from_codes(
+                rng.integers(0, 2, n_sets), ["bilateral", "unilateral"]
+            ),
+            "Number of repetitions": rng.integers(1, 16, n_sets).astype(np.float32),
+            "Charge (kg)": (rng.integers(0, 80, n_sets) * 2.5).astype(np.float32),
+        }
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sets", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=100)
+    args = parser.parse_args()
+
+    df = make_multi_user_log(args.sets, args.users)
+
+    timings = {}
+    start = time.perf_counter()
+    load = TrainingLoad(df)
+    timings["dense matrices"] = time.perf_counter() - start
+    for name in [
+        "weekly_tonnage",
+        "weekly_sets",
+        "relative_intensity",
+        "acwr",
+        "monotony",
+        "strain",
+    ]:
+        start = time.perf_counter()
+        getattr(load, name)()
+        timings[name] = time.perf_counter() - start
+
+    print(
+        f"{args.sets:,} sets, {args.users} users, {len(load.dates)} days, "
+        f"{len(load.muscles)} muscles"
+    )
+    for name, seconds in timings.items():
+        print(f"{name:18s}: {seconds * 1000:8.1f} ms")
+    print(f"{'total':18s}: {sum(timings.values()) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Per-call overhead of WorkoutLogger.generate with the LLM stubbed out: chains
+rebuilt on every call (previous setup_chain) vs. compiled once at construction.
+
+Run from the repository root: python -m benchmarks.bench_workout_logger
+"""
+import argparse
+import json
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+from langchain.prompts import ChatPromptTemplate
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.workout_log.workout_parser import WorkoutLogger
+
+STUB_WORKOUT = json.dumps(
+    {"date": None, "name": "Stub", "type": "PUSH", "sets": [], "remarks": ""}
+)
+
+
+def legacy_generate(logger, input_text):
+    # Previous behaviour: prompt, format instructions and chain built per call
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", logger.system),
+            ("human", "{input_text}"),
+        ]
+    ).partial(format_instructions=logger.parser.get_format_instructions())
+    chain = prompt | logger.llm | logger.parser
+    return chain.invoke({"input_text": input_text})
+
+
+def per_call(fn, calls):
+    start = time.perf_counter()
+    for i in range(calls):
+        fn(f"Bench 4*10 at {i} kg")
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    stub = FakeListChatModel(responses=[STUB_WORKOUT])
+    start = time.perf_counter()
+    logger = WorkoutLogger(llm=stub, mllm=stub, use_cache=False)
+    construction = time.perf_counter() - start
+
+    legacy = per_call(lambda text: legacy_generate(logger, text), args.calls)
+    compiled = per_call(lambda text: logger.generate(input_text=text), args.calls)
+
+    print(f"construction       : {construction * 1000:8.2f} ms (once)")
+    print(f"legacy per call    : {legacy * 1000:8.2f} ms")
+    print(f"compiled per call  : {compiled * 1000:8.2f} ms ({legacy / compiled:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Compare the memory footprint of a synthetic 1M-set workout log stored as the
+legacy object-dtype frame, as a compact flat frame (categoricals and fixed-width
+numbers) and as separate workouts/sets tables, and time appending one parsed
+workout: to the legacy frame, to the compact frame (add_workout_to_dataframe)
+and to a WorkoutLog, which only builds the new workout's tables.
+
+Run from the repository root: python -m benchmarks.bench_workout_memory
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import pandas as pd
+
+from benchmarks.synthetic import make_workout_log
+from src.workout_log.workout_parser import (
+    WorkoutLog,
+    add_workout_to_dataframe,
+    compact_log,
+    split_log,
+)
+
+WORKOUT = {
+    "date": "18-10-2024 18:30",
+    "name": "Push day",
+    "type": "PUSH",
+    "remarks": "Benchmark workout",
+    "sets": [
+        {
+            "exercice": {
+                "name": "Bench Press",
+                "charge_type": "Barbell",
+                "execution_mode": "bilateral",
+            },
+            "nb_reps": 5,
+            "charge": 80.0,
+            "rest": 180,
+        }
+    ]
+    * 12,
+}
+
+
+def megabytes(*frames):
+    return sum(frame.memory_usage(deep=True).sum() for frame in frames) / 2**20
+
+
+def legacy_add_workout(workout, df):
+    # Previous implementation: dict rows, object columns, plain concat
+    rows = [
+        {
+            "Date": workout["date"],
+            "Workout name": workout["name"],
+            "Workout type": workout["type"],
+            "Set number ": i + 1,
+            "Exercise name": set_obj["exercice"]["name"],
+            "Equipment": set_obj["exercice"]["charge_type"],
+            "Execution mode": set_obj["exercice"]["execution_mode"],
+            "Number of repetitions": set_obj["nb_reps"],
+            "Charge (kg)": set_obj["charge"],
+            "Rest time (sec)": set_obj["rest"],
+            "Remarks": str(workout["remarks"]),
+        }
+        for i, set_obj in enumerate(workout["sets"])
+    ]
+    return pd.concat([df, pd.DataFrame(rows)], ignore_index=True)
+
+
+def timeit(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sets", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    legacy = make_workout_log(args.sets).astype(object)
+    compact = compact_log(legacy)
+    workouts, sets = split_log(legacy)
+
+    print(f"{args.sets:,} sets, {len(workouts):,} workouts")
+    legacy_mb = megabytes(legacy)
+    for label, size in [
+        ("legacy object frame", legacy_mb),
+        ("compact flat frame", megabytes(compact)),
+        ("workouts + sets", megabytes(workouts, sets)),
+    ]:
+        print(f"{label:20s}: {size:8.1f} MB ({legacy_mb / size:.1f}x)")
+
+    legacy_time = timeit(lambda: legacy_add_workout(WORKOUT, legacy), args.repeat)
+    compact_time = timeit(
+        lambda: add_workout_to_dataframe(WORKOUT, compact), args.repeat
+    )
+    log_time = timeit(lambda: WorkoutLog().add(WORKOUT), args.repeat)
+    print(f"append, legacy frame  : {legacy_time * 1000:8.1f} ms")
+    print(f"append, compact frame : {compact_time * 1000:8.1f} ms")
+    print(f"append, WorkoutLog    : {log_time * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import json
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+STUB_DIET_PLAN = {
+    "goal": "Lose 3 kg of fat",
+    "kcal_intake": 2300,
+    "method": "Mifflin-St Jeor x activity factor",
+    "macros": {"g_proteins": 150, "g_fat": 70, "g_carbohydrates": 268},
+    "explanation": "A 10% calorie deficit with high proteins to keep muscle.",
+}
+STUB_EXPLANATION = " ".join(
+    ["A 10% calorie deficit with high proteins keeps muscle while losing fat."] * 3
+)
+STUB_MEAL = {
+    "name": "Oats and eggs",
+    "ingredients": [
+        {"name": "oats", "quantity": "80 g"},
+        {"name": "eggs", "quantity": "150 g"},
+    ],
+    "recipe": "Cook the oats in water, scramble the eggs.",
+    "kcals": 650,
+    "macros": {"g_proteins": 40, "g_fat": 20, "g_carbohydrates": 75},
+}
+STUB_COOKBOOK = {"meals": [STUB_MEAL, STUB_MEAL, STUB_MEAL]}
+STUB_RESPONSE = " ".join(["Here is your plan, built around your goal."] * 30)
+STUB_SUMMARY = " ".join(
+    ["The user wants to lose fat, eats everything and trains 4 times a week."] * 3
+)
+
+
+def stub_answer(messages: List[BaseMessage]) -> str:
+    """Pick a plausible answer from the prompt of each pipeline stage."""
+    prompt = " ".join(str(message.content) for message in messages)
+    if "Update the summary" in prompt:
+        return STUB_SUMMARY
+    if "diet planner" in prompt:
+        # Numbers computed locally: only the explanation is asked for
+        if "already computed" in prompt:
+            return STUB_EXPLANATION
+        return json.dumps(STUB_DIET_PLAN)
+    if "comprehensive response" in prompt:
+        return STUB_RESPONSE
+    if "one meal" in prompt:
+        return json.dumps(STUB_MEAL)
+    return json.dumps(STUB_COOKBOOK)
+
+
+class LatencyChatModel(GenericFakeChatModel):
+    """
+    Chat model stub with the latency profile of a remote LLM: `latency`
+    seconds plus `prompt_latency` per prompt token (prefill) before the first
+    token, then `token_latency` per token. Answers are chosen from the prompt
+    (see stub_answer), so concurrent calls of the pipeline stages each get the
+    right payload.
+    """
+
+    messages: Iterator[AIMessage] = iter(())
+    latency: float = 1.0
+    token_latency: float = 0.01
+    prompt_latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "latency-stub"
+
+    def _first_token_latency(self, messages):
+        prompt_chars = sum(len(str(message.content)) for message in messages)
+        return self.latency + self.prompt_latency * prompt_chars / 4
+
+    def _tokens(self, messages):
+        # About 4 characters per token, as with the BPE tokenizers of real LLMs
+        answer = stub_answer(messages)
+        return [answer[i : i + 4] for i in range(0, len(answer), 4)]
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tokens = self._tokens(messages)
+        time.sleep(
+            self._first_token_latency(messages) + self.token_latency * len(tokens)
+        )
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))]
+        )
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self._first_token_latency(messages))
+        tokens = self._tokens(messages)
+        for token in tokens:
+            time.sleep(self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from src.workout_log.perf_analysis import exercise_to_muscle_map
+
+EQUIPMENTS = ["Barbell", "Dumbell", "Machine", "Cable", "Bodyweight"]
+WORKOUT_TYPES = ["UPPER BODY", "LOWER BODY", "PUSH", "PULL", "FULL BODY"]
+
+
+def make_workout_log(n_sets, n_days=3 * 365, seed=0):
+    """
+    Build a synthetic workout log with the same columns as the CSV logs in
+    data/workout_logs/ (dates as '%d-%m-%Y' strings).
+    """
+    rng = np.random.default_rng(seed)
+    exercises = np.array(list(exercise_to_muscle_map))
+    days = pd.Timestamp("2022-01-01") + pd.to_timedelta(
+        np.sort(rng.integers(0, n_days, n_sets)), unit="D"
+    )
+    return pd.DataFrame(
+        {
+            "Date": days.strftime("%d-%m-%Y"),
+            "Workout name": "Synthetic",
+            "Workout type": rng.choice(WORKOUT_TYPES, n_sets),
+            "Set number ": rng.integers(1, 6, n_sets),
+            "Exercise name": rng.choice(exercises, n_sets),
+            "Equipment": rng.choice(EQUIPMENTS, n_sets),
+            "Execution mode": rng.choice(["bilateral", "unilateral"], n_sets),
+            "Number of repetitions": rng.integers(1, 16, n_sets).astype(float),
+            "Charge (kg)": rng.integers(0, 80, n_sets) * 2.5,
+            "Rest time (sec)": rng.choice([60.0, 90.0, 120.0, 180.0], n_sets),
+            "Remarks": "Synthetic session, felt strong.",
+        }
+    )
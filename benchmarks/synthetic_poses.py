@@ -0,0 +1,66 @@
+import numpy as np
+
+from src.pose_estimation.estimator import joints_id_dict
+
+
+def squat_keypoints(n_frames, fps=30.0, rep_duration=2.0, noise=2.0, seed=0):
+    """
+    Side view of a person squatting, as a (frames x 17 x 3) array of pixel
+    coordinates and confidences. The hip goes below the knee at every bottom.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_frames) / fps
+    # 0 standing, 1 bottom of the squat
+    depth = (1 - np.cos(2 * np.pi * t / rep_duration)) / 2
+
+    keypoints = np.zeros((n_frames, 17, 3))
+    ankle = np.array([500.0, 900.0])
+    knee = ankle + [15.0, -200.0] + depth[:, None] * [80.0, 20.0]
+    hip = np.stack([500.0 - 120 * depth, 500.0 + 230 * depth], axis=1)
+    shoulder = hip + np.stack([30 + 120 * depth, -260 + 40 * depth], axis=1)
+    elbow = shoulder + [60.0, 40.0]
+    wrist = shoulder + [20.0, 10.0]
+    head = shoulder + [20.0, -80.0]
+    positions = {
+        "ankle": ankle,
+        "knee": knee,
+        "hip": hip,
+        "shoulder": shoulder,
+        "elbow": elbow,
+        "wrist": wrist,
+        "ear": head,
+        "eye": head + [15.0, -5.0],
+    }
+    for joint, xy in positions.items():
+        for side in ("left", "right"):
+            keypoints[:, joints_id_dict[f"{side}_{joint}"], :2] = xy
+    keypoints[:, joints_id_dict["nose"], :2] = head + [25.0, 5.0]
+    keypoints[..., :2] += rng.normal(0, noise, (n_frames, 17, 2))
+    keypoints[..., 2] = rng.uniform(0.6, 1.0, (n_frames, 17))
+    return keypoints
+
+
+def crowd_sequence(n_frames, n_people, size=(1920, 1080), miss_rate=0.05, seed=0):
+    """
+    Several people walking around a frame, detected in random order with some
+    missed detections. Yields (frame index, boxes, keypoints, true ids) per
+    frame, in pixels.
+    """
+    rng = np.random.default_rng(seed)
+    template = squat_keypoints(1, noise=0.0)[0, :, :2]
+    template = (template - template.mean(axis=0)) * 0.5
+    half_box = np.array([60.0, 130.0])
+    position = rng.uniform(half_box, np.array(size) - half_box, (n_people, 2))
+    heading = rng.normal(0, 3.0, (n_people, 2))
+    for frame_index in range(n_frames):
+        heading = 0.95 * heading + rng.normal(0, 0.5, (n_people, 2))
+        position = np.clip(position + heading, half_box, np.array(size) - half_box)
+        keypoints = np.empty((n_people, 17, 3))
+        keypoints[..., :2] = (
+            position[:, None] + template + rng.normal(0, 2.0, (n_people, 17, 2))
+        )
+        keypoints[..., 2] = rng.uniform(0.5, 1.0, (n_people, 17))
+        boxes = np.concatenate([position - half_box, position + half_box], axis=1)
+        detected = rng.permutation(n_people)
+        detected = detected[rng.random(n_people) >= miss_rate]
+        yield frame_index, boxes[detected], keypoints[detected], detected
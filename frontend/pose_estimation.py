@@ -1,38 +1,232 @@
 import streamlit as st
 import sys
 import os
+import atexit
+import math
+import shutil
+import tempfile
+import threading
+from functools import partial
 import cv2
+import pandas as pd
 
 sys.path.append(os.getcwd())
-from src.pose_estimation.estimator import model
-from frontend.utils import save_uploaded_file
+from src.pose_estimation.estimator import POSE_MODEL_VARIANTS, get_pose_model
+from src.pose_estimation.batch import estimate_image_poses
+from src.pose_estimation.video import estimate_video_poses, load_tracks
+from src.pose_estimation.kinematics import EXERCISE_RULES
+from src.pose_estimation.tracking import track_poses
+from src.pose_estimation.realtime import LivePoseEstimator
+from frontend.utils import decode_uploaded_image, upload_hash, uploaded_video_path
+
+
+@st.cache_resource
+def load_pose_model(variant, export_format):
+    # Loaded once per process, Streamlit reruns reuse it
+    return get_pose_model(variant=variant, export_format=export_format)
+
+
+@st.cache_data(max_entries=16)
+def estimate_images_poses(
+    content_hashes, _uploaded_files, variant, export_format, batch_size
+):
+    # Cached by content hash: re-applying on the same uploads is free
+    poses, stats = estimate_image_poses(
+        load_pose_model(variant, export_format),
+        # Decoded by the loading threads, one batch ahead of the model
+        [partial(decode_uploaded_image, f) for f in _uploaded_files],
+        batch_size=batch_size,
+        with_plots=True,
+    )
+    for pose in poses:
+        if not isinstance(pose, Exception):
+            pose["plot"] = cv2.cvtColor(pose["plot"], cv2.COLOR_BGR2RGB)
+    return poses, stats
+
+
+# Analysed videos kept on disk per process, least recently used dropped first
+VIDEO_CACHE_ENTRIES = 16
+
+
+@st.cache_resource
+def video_results():
+    # Shared by every session: (directory of the results, lock). Only paths
+    # are handed around, the videos and tracks stay on disk
+    root = tempfile.mkdtemp(prefix="pose_results_")
+    atexit.register(shutil.rmtree, root, ignore_errors=True)
+    return root, threading.Lock()
+
+
+def _evict_video_results(root):
+    results = sorted(
+        (entry for entry in os.scandir(root) if not entry.name.startswith("tmp")),
+        key=lambda entry: entry.stat().st_mtime,
+    )
+    for entry in results[: max(len(results) - VIDEO_CACHE_ENTRIES, 0)]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def estimate_uploaded_video(
+    content_hash, uploaded_file, variant, export_format, stride, max_fps, on_progress
+):
+    # Not st.cache_data: the progress callback writes to an element of the
+    # current run, which Streamlit cannot replay on a cache hit. The result is
+    # cached on disk, by content hash and settings, and its paths returned
+    root, lock = video_results()
+    result_dir = os.path.join(
+        root, f"{content_hash}_{variant}_{export_format}_{stride}_{max_fps}"
+    )
+    output_video = os.path.join(result_dir, "pose.mp4")
+    track_path = os.path.join(result_dir, "tracks.npz")
+    with lock:
+        if os.path.isdir(result_dir):
+            os.utime(result_dir)
+            return output_video, track_path
+    # Written aside then renamed: a result directory is always complete
+    work_dir = tempfile.mkdtemp(prefix="tmp", dir=root)
+    try:
+        with uploaded_video_path(uploaded_file) as file_path:
+            estimate_video_poses(
+                load_pose_model(variant, export_format),
+                file_path,
+                output_video=os.path.join(work_dir, "pose.mp4"),
+                track_path=os.path.join(work_dir, "tracks.npz"),
+                stride=stride,
+                max_fps=max_fps,
+                on_progress=on_progress,
+            )
+        with lock:
+            if not os.path.isdir(result_dir):
+                os.rename(work_dir, result_dir)
+            _evict_video_results(root)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return output_video, track_path
+
+
+def live_analysis(variant, export_format):
+    source = st.text_input("Camera index, stream URL or video file", value="0")
+    start_col, stop_col = st.columns(2)
+    start = start_col.button("Start", use_container_width=True)
+    stop = stop_col.button("Stop", use_container_width=True)
+    if "live_pose" in st.session_state and (start or stop):
+        st.session_state.pop("live_pose").stop()
+    if not start:
+        return
+
+    model = load_pose_model(variant, export_format)
+    estimator = LivePoseEstimator(model, source).start()
+    st.session_state["live_pose"] = estimator
+    col1, col2 = st.columns([0.7, 0.3])
+    image_slot = col1.empty()
+    metrics_slot = col2.empty()
+    for frame in estimator.frames():
+        image_slot.image(
+            cv2.cvtColor(frame.result.plot(), cv2.COLOR_BGR2RGB), use_column_width=True
+        )
+        metrics = estimator.metrics.snapshot()
+        metrics_slot.json(
+            {
+                "reps": frame.reps,
+                "angles": {
+                    k: None if math.isnan(v) else round(v)
+                    for k, v in frame.angles.items()
+                },
+                "fps": round(metrics["fps"], 1),
+                "latency_ms": {k: round(v, 1) for k, v in metrics["latency_ms"].items()},
+                "dropped": estimator.dropped,
+            }
+        )
 
 
 ############ Main ############
 
 st.title("Pose Estimation")
 
+variant = st.sidebar.selectbox(
+    "Model", list(POSE_MODEL_VARIANTS), index=list(POSE_MODEL_VARIANTS).index("medium")
+)
+backend = st.sidebar.selectbox("Backend", ["PyTorch", "ONNX", "OpenVINO"])
+export_format = None if backend == "PyTorch" else backend.lower()
+
+if st.sidebar.radio("Source", ["Upload", "Live camera"]) == "Live camera":
+    live_analysis(variant, export_format)
+    st.stop()
+
 col1, col2 = st.columns(2)
 
+IMAGE_EXTENSIONS = ("jpg", "jpeg", "png")
+
 with col1:
-    uploaded_file = st.file_uploader(
-        "Choose an file...", type=["jpg", "jpeg", "png", "mp4", "avi", "mov"]
+    uploaded_files = st.file_uploader(
+        "Choose files...",
+        type=["jpg", "jpeg", "png", "mp4", "avi", "mov"],
+        accept_multiple_files=True,
     )
+images = [f for f in uploaded_files if f.name.lower().endswith(IMAGE_EXTENSIONS)]
+videos = [f for f in uploaded_files if not f.name.lower().endswith(IMAGE_EXTENSIONS)]
 
-if uploaded_file is not None:
+if uploaded_files:
     with col1:
+        if images:
+            batch_size = st.number_input("Images per batch", min_value=1, value=8)
+        if videos:
+            stride = st.number_input("Analyse one frame every", min_value=1, value=1)
+            max_fps = st.number_input(
+                "Max analysed frames per second", min_value=1, value=15
+            )
+            exercise = st.selectbox("Exercise", list(EXERCISE_RULES))
         apply_button = st.button("Apply Pose Estimation")
 
-    if apply_button:
-        file_path = save_uploaded_file(uploaded_file)
-        # The file is an image
-        if uploaded_file.name.endswith(("jpg", "jpeg", "png")):
-            results = model(source=file_path)
-            img = results[0].plot()
-            img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            with col2:
-                st.image(img_rgb, use_column_width=True)
-
-        # The file is a video
-        else:
-            results = model(source=st.session_state["file_path"])
+    if apply_button and images:
+        poses, stats = estimate_images_poses(
+            tuple(upload_hash(f) for f in images),
+            images,
+            variant,
+            export_format,
+            batch_size,
+        )
+        with col2:
+            st.caption(
+                f"{stats['images']} images in {stats['batches']} batches, "
+                f"{stats['images_per_second']:.1f} images/s"
+            )
+            tabs = st.tabs([f.name for f in images])
+            for tab, pose in zip(tabs, poses):
+                if isinstance(pose, Exception):
+                    tab.error(f"Could not analyse this image: {pose}")
+                    continue
+                tab.image(pose["plot"], use_column_width=True)
+                tab.caption(f"{len(pose['scores'])} persons detected")
+
+    for uploaded_file in videos if apply_button else []:
+        progress = col2.progress(0.0, text=f"Analysing {uploaded_file.name}...")
+        video, track_path = estimate_uploaded_video(
+            upload_hash(uploaded_file),
+            uploaded_file,
+            variant,
+            export_format,
+            stride,
+            max_fps,
+            on_progress=lambda done, total: progress.progress(
+                min(done / total, 1.0) if total else 0.0,
+                text=f"Analysing {uploaded_file.name}...",
+            ),
+        )
+        progress.empty()
+        stem = os.path.splitext(uploaded_file.name)[0]
+        with col2:
+            st.video(video)
+            with open(track_path, "rb") as track_file:
+                st.download_button(
+                    "Download keypoint tracks",
+                    track_file,
+                    file_name=f"{stem}_tracks.npz",
+                )
+            tracks = load_tracks(track_path)
+            fps = float(tracks["fps"]) / int(tracks["stride"])
+            # One form analysis per athlete in frame
+            for track_id, (_, keypoints) in track_poses(tracks).items():
+                reps = EXERCISE_RULES[exercise](keypoints, fps)
+                st.markdown(f"### Athlete {track_id}: {len(reps['bottom'])} reps")
+                st.dataframe(pd.DataFrame(reps), use_container_width=True)
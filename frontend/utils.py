@@ -1,15 +1,42 @@
+import hashlib
 import os
-import streamlit as st
-
-def save_uploaded_file(uploaded_file):
-    try:
-        file_path = os.path.join('src', 'pose_estimation', 'file_uploaded', uploaded_file.name)
-        par_dir = os.path.dirname(file_path)
-        if not os.path.exists(par_dir):
-            os.makedirs(par_dir, exist_ok=True)
-        with open(file_path, 'wb') as f:
-            f.write(uploaded_file.getvalue())
-        return file_path
-    except Exception as e:
-        st.error(f"Error: {e}")
-        return None
\ No newline at end of file
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+
+def upload_hash(uploaded_file):
+    """Content hash of an upload, used as cache key for repeated inference."""
+    with uploaded_file.getbuffer() as buffer:
+        return hashlib.sha256(buffer).hexdigest()
+
+
+def decode_uploaded_image(uploaded_file):
+    """
+    Decode an uploaded image straight from the upload buffer (no copy, nothing
+    written to disk). Returns a BGR array, as OpenCV and YOLO expect.
+    """
+    with uploaded_file.getbuffer() as buffer:
+        image = cv2.imdecode(np.frombuffer(buffer, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Cannot decode image {uploaded_file.name}")
+    return image
+
+
+@contextmanager
+def uploaded_video_path(uploaded_file):
+    """
+    Stream an uploaded video into a private temporary file (OpenCV needs a
+    path) and yield its path. The temporary directory, and anything written
+    next to the video, is deleted on exit.
+    """
+    suffix = os.path.splitext(uploaded_file.name)[1]
+    with tempfile.TemporaryDirectory(prefix="pose_upload_") as tmpdir:
+        path = os.path.join(tmpdir, f"upload{suffix}")
+        uploaded_file.seek(0)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(uploaded_file, f, length=1024 * 1024)
+        yield path
@@ -0,0 +1,178 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import cv2
+import numpy as np
+
+
+def letterbox(image, size=640, color=114):
+    """
+    Resize an image to fit a size x size square, keeping the aspect ratio, and
+    pad the rest. Returns the square image, the scale and the (left, top)
+    padding, to map coordinates back to the original image.
+    """
+    height, width = image.shape[:2]
+    scale = size / max(height, width)
+    new_width, new_height = round(width * scale), round(height * scale)
+    if (new_width, new_height) != (width, height):
+        image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_AREA)
+    left, top = (size - new_width) // 2, (size - new_height) // 2
+    padded = np.full((size, size, 3), color, dtype=np.uint8)
+    padded[top : top + new_height, left : left + new_width] = image
+    return padded, scale, (left, top)
+
+
+def load_image(image):
+    """
+    Image path, BGR array or function returning one (to decode lazily, in the
+    loading threads) -> BGR array.
+    """
+    if callable(image):
+        image = image()
+    if isinstance(image, np.ndarray):
+        return image
+    loaded = cv2.imread(str(image), cv2.IMREAD_COLOR)
+    if loaded is None:
+        raise IOError(f"Cannot read image {image}")
+    return loaded
+
+
+def _unletterbox(result, scale, pad, shape, with_plot):
+    offset = np.array(pad, dtype=np.float32)
+    if result.keypoints is None or len(result.boxes) == 0:
+        pose = {
+            "keypoints": np.empty((0, 17, 3), np.float32),
+            "boxes": np.empty((0, 4), np.float32),
+            "scores": np.empty(0, np.float32),
+        }
+    else:
+        keypoints = result.keypoints.data.cpu().numpy().copy()
+        keypoints[..., :2] = (keypoints[..., :2] - offset) / scale
+        boxes = (result.boxes.xyxy.cpu().numpy() - np.tile(offset, 2)) / scale
+        pose = {
+            "keypoints": keypoints,
+            "boxes": boxes,
+            "scores": result.boxes.conf.cpu().numpy(),
+        }
+    if with_plot:
+        height, width = shape[:2]
+        left, top = pad
+        plot = result.plot()[
+            top : top + round(height * scale), left : left + round(width * scale)
+        ]
+        pose["plot"] = cv2.resize(plot, (width, height))
+    return pose
+
+
+def _prepare(image, imgsz):
+    # An unreadable image is returned as its exception rather than raised, so
+    # that the rest of the batch is still analysed
+    try:
+        image = load_image(image)
+        return (image.shape, *letterbox(image, imgsz))
+    except Exception as e:
+        return e
+
+
+def estimate_image_poses(
+    model,
+    images,
+    batch_size=8,
+    imgsz=640,
+    threads=None,
+    device="cpu",
+    with_plots=False,
+):
+    """
+    Run pose estimation on a list of images (see load_image) in batches.
+
+    Images are loaded and letterboxed to imgsz x imgsz by a thread pool while
+    the previous batch is inferred, so every batch is one fixed-size tensor.
+    At most two batches of images are decoded at a time.
+
+    Parameters:
+    - model: A YOLO pose model.
+    - batch_size: Number of images per inference call.
+    - imgsz: Side of the square model input.
+    - threads: Number of loading threads, also used as the number of Torch
+      intra-op threads during the call when set.
+    - with_plots: Also return the annotated images, at their original size.
+
+    Returns a list with, for each image, a dict of keypoints (n x 17 x 3:
+    x, y in original pixels and confidence), boxes (n x 4 xyxy) and scores
+    (n), or the exception raised when loading it, and a dict of throughput
+    stats.
+    """
+    if threads is None:
+        return _estimate_image_poses(
+            model, images, batch_size, imgsz, threads, device, with_plots
+        )
+    import torch
+
+    # The Torch setting is process-wide: restored once the images are done
+    previous_threads = torch.get_num_threads()
+    torch.set_num_threads(threads)
+    try:
+        return _estimate_image_poses(
+            model, images, batch_size, imgsz, threads, device, with_plots
+        )
+    finally:
+        torch.set_num_threads(previous_threads)
+
+
+def _estimate_image_poses(model, images, batch_size, imgsz, threads, device, with_plots):
+    start = time.perf_counter()
+    inference_time = 0.0
+    poses = []
+    images = iter(images)
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+
+        def submit_batch():
+            return [
+                pool.submit(_prepare, image, imgsz)
+                for image in islice(images, batch_size)
+            ]
+
+        pending = submit_batch()
+        while pending:
+            batch = [future.result() for future in pending]
+            # Load the next batch while this one is inferred
+            pending = submit_batch()
+            inference_time += _infer(model, batch, imgsz, device, with_plots, poses)
+    elapsed = time.perf_counter() - start
+
+    errors = sum(isinstance(pose, Exception) for pose in poses)
+    analysed = len(poses) - errors
+    stats = {
+        "images": analysed,
+        "errors": errors,
+        "batches": -(-len(poses) // batch_size),
+        "seconds": elapsed,
+        "inference_seconds": inference_time,
+        "images_per_second": analysed / elapsed if elapsed > 0 else 0.0,
+    }
+    return poses, stats
+
+
+def _infer(model, batch, imgsz, device, with_plots, poses):
+    ready = [item for item in batch if not isinstance(item, Exception)]
+    start = time.perf_counter()
+    results = []
+    if ready:
+        results = model(
+            [padded for _, padded, _, _ in ready],
+            imgsz=imgsz,
+            batch=len(ready),
+            device=device,
+            verbose=False,
+        )
+    elapsed = time.perf_counter() - start
+    results = iter(results)
+    for item in batch:
+        if isinstance(item, Exception):
+            poses.append(item)
+            continue
+        shape, _, scale, pad = item
+        poses.append(_unletterbox(next(results), scale, pad, shape, with_plots))
+    return elapsed
@@ -1,5 +1,5 @@
-from ultralytics import YOLO
-import numpy as np
+import os
+from functools import lru_cache
 
 id_joints_dict = {0: 'nose',
         1: 'left_eye',
@@ -20,5 +20,47 @@ id_joints_dict = {0: 'nose',
         16: 'right_ankle'}
 joints_id_dict = {v: k for k, v in id_joints_dict.items()}
 
-# Load a model
-model = YOLO("src/pose_estimation/models/yolo11m-pose.pt")  # load an official model
\ No newline at end of file
+MODELS_DIR = os.path.join("src", "pose_estimation", "models")
+# Smaller variants trade accuracy for speed, nano is the one for CPU real time
+POSE_MODEL_VARIANTS = {
+    "nano": "yolo11n-pose",
+    "small": "yolo11s-pose",
+    "medium": "yolo11m-pose",
+}
+EXPORT_FORMATS = {
+    "onnx": "{name}.onnx",
+    "openvino": "{name}_openvino_model",
+}
+
+
+@lru_cache(maxsize=None)
+def get_pose_model(variant="medium", device="cpu", export_format=None, imgsz=640):
+    """
+    Load a YOLO pose model on first use and cache it for the process.
+
+    Parameters:
+    - variant: "nano", "small" or "medium".
+    - device: Torch device the PyTorch weights are moved to.
+    - export_format: None for the PyTorch weights, or "onnx" / "openvino" for a
+      model exported for faster CPU inference (exported on first use next to
+      the weights, then reloaded from disk).
+    - imgsz: Input size used when exporting.
+    """
+    # Torch and Ultralytics are only imported when a model is actually needed
+    from ultralytics import YOLO
+
+    name = POSE_MODEL_VARIANTS[variant]
+    weights = os.path.join(MODELS_DIR, f"{name}.pt")
+    if not os.path.isfile(weights):
+        # Official weights are downloaded by Ultralytics
+        weights = f"{name}.pt"
+
+    if export_format is None:
+        return YOLO(weights).to(device)
+
+    exported = os.path.join(MODELS_DIR, EXPORT_FORMATS[export_format].format(name=name))
+    if not os.path.exists(exported):
+        os.makedirs(MODELS_DIR, exist_ok=True)
+        path = YOLO(weights).export(format=export_format, imgsz=imgsz)
+        os.replace(path, exported)
+    return YOLO(exported, task="pose")
\ No newline at end of file
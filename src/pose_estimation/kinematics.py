@@ -0,0 +1,182 @@
+import numpy as np
+from scipy.signal import find_peaks
+
+from src.pose_estimation.estimator import joints_id_dict
+
+# Joint angle -> (proximal joint, vertex, distal joint), for each side
+ANGLE_JOINTS = {
+    "knee": ("hip", "knee", "ankle"),
+    "hip": ("shoulder", "hip", "knee"),
+    "elbow": ("shoulder", "elbow", "wrist"),
+    "shoulder": ("hip", "shoulder", "elbow"),
+}
+MIN_CONFIDENCE = 0.3
+
+
+def _joint(keypoints, side, joint):
+    return keypoints[:, joints_id_dict[f"{side}_{joint}"]]
+
+
+def angle_between(a, b, c):
+    """Angle at b, in degrees, between the segments b->a and b->c (n x 2 each)."""
+    ba = a - b
+    bc = c - b
+    cos = np.einsum("ij,ij->i", ba, bc) / (
+        np.linalg.norm(ba, axis=1) * np.linalg.norm(bc, axis=1)
+    )
+    return np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+
+
+def joint_angles(keypoints, min_confidence=MIN_CONFIDENCE):
+    """
+    Knee, hip, elbow and shoulder angles of a (frames x 17 x 3) keypoint array,
+    in degrees. For each joint the side seen with the highest confidence is
+    used (lifts are usually filmed from the side); frames where that side is not
+    visible enough are NaN.
+    """
+    angles = {}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for name, joints in ANGLE_JOINTS.items():
+            sides = []
+            for side in ("left", "right"):
+                points = [_joint(keypoints, side, joint) for joint in joints]
+                angle = angle_between(*(p[:, :2] for p in points))
+                confidence = np.min([p[:, 2] for p in points], axis=0)
+                sides.append((angle, confidence))
+            (left, left_conf), (right, right_conf) = sides
+            angle = np.where(left_conf >= right_conf, left, right)
+            confidence = np.maximum(left_conf, right_conf)
+            angles[name] = np.where(confidence >= min_confidence, angle, np.nan)
+    return angles
+
+
+def fill_gaps(signal):
+    """Linearly interpolate the NaN frames of a 1D signal."""
+    signal = np.asarray(signal, dtype=np.float64)
+    valid = ~np.isnan(signal)
+    if valid.all() or not valid.any():
+        return signal
+    frames = np.arange(len(signal))
+    return np.interp(frames, frames[valid], signal[valid])
+
+
+def smooth(signal, window=5):
+    """Centered moving average (edges padded), computed with a cumulative sum."""
+    signal = fill_gaps(signal)
+    if window <= 1 or len(signal) == 0:
+        return signal
+    pad = window // 2
+    padded = np.pad(signal, (pad, window - 1 - pad), mode="edge")
+    cumsum = np.cumsum(np.insert(padded, 0, 0.0))
+    return (cumsum[window:] - cumsum[:-window]) / window
+
+
+def velocity(signal, fps, window=5):
+    """Smoothed first derivative of a signal, in units per second."""
+    return np.gradient(smooth(signal, window), 1.0 / fps)
+
+
+def midpoint(keypoints, joint, min_confidence=MIN_CONFIDENCE):
+    """
+    Midpoint (frames x 2) of the left and right joints, falling back to the
+    visible side. NaN when neither side is visible.
+    """
+    left = _joint(keypoints, "left", joint)
+    right = _joint(keypoints, "right", joint)
+    left_ok = (left[:, 2] >= min_confidence)[:, None]
+    right_ok = (right[:, 2] >= min_confidence)[:, None]
+    return np.where(
+        left_ok & right_ok,
+        (left[:, :2] + right[:, :2]) / 2,
+        np.where(left_ok, left[:, :2], np.where(right_ok, right[:, :2], np.nan)),
+    )
+
+
+# Where the bar sits, per exercise: on the back for squats, in the hands otherwise
+BAR_JOINT = {"squat": "shoulder", "bench press": "wrist", "deadlift": "wrist"}
+
+
+def bar_path(keypoints, exercise, window=5):
+    """Smoothed (frames x 2) trajectory of the joint carrying the bar."""
+    path = midpoint(keypoints, BAR_JOINT.get(exercise, "wrist"))
+    return np.stack([smooth(path[:, 0], window), smooth(path[:, 1], window)], axis=1)
+
+
+def segment_reps(angle, fps, min_range=30.0, min_duration=0.5, window=5):
+    """
+    Split a joint angle signal into repetitions: each rep goes from a top
+    (extended joint, angle peak) through a bottom (angle valley) back to a top.
+
+    Parameters:
+    - angle: Joint angle per frame, in degrees (NaN frames are interpolated).
+    - fps: Frame rate of the signal.
+    - min_range: Minimum range of motion of a rep, in degrees.
+    - min_duration: Minimum time between two bottoms, in seconds.
+
+    Returns a dict of arrays with one entry per rep: start, bottom and end
+    frames, and the angle range of motion.
+    """
+    signal = smooth(angle, window)
+    distance = max(1, int(min_duration * fps))
+    bottoms, _ = find_peaks(-signal, prominence=min_range, distance=distance)
+    # Prominence keeps noise wiggles at the bottom from being taken as tops
+    tops, _ = find_peaks(
+        np.concatenate([[-np.inf], signal, [-np.inf]]),
+        prominence=min_range / 2,
+        distance=distance,
+    )
+    tops -= 1
+    # Start: last top before the bottom, end: first top after it
+    before = np.searchsorted(tops, bottoms) - 1
+    after = before + 1
+    keep = (before >= 0) & (after < len(tops))
+    bottoms, before, after = bottoms[keep], before[keep], after[keep]
+    start, end = tops[before], tops[after]
+    range_of_motion = np.minimum(signal[start], signal[end]) - signal[bottoms]
+    keep = range_of_motion >= min_range
+    return {
+        "start": start[keep],
+        "bottom": bottoms[keep],
+        "end": end[keep],
+        "range_of_motion": range_of_motion[keep],
+    }
+
+
+def analyse_squat(keypoints, fps, lockout_angle=165.0):
+    """
+    Segment squat reps on the knee angle and check each of them:
+    - depth: hip crease below the top of the knee at the bottom (image y axis
+      points down),
+    - lockout: knee and hip extended above lockout_angle at the end of the rep.
+    """
+    angles = joint_angles(keypoints)
+    reps = segment_reps(angles["knee"], fps)
+    hip_y = smooth(midpoint(keypoints, "hip")[:, 1])
+    knee_y = smooth(midpoint(keypoints, "knee")[:, 1])
+    knee, hip = smooth(angles["knee"]), smooth(angles["hip"])
+    bottom, end = reps["bottom"], reps["end"]
+    reps["bottom_knee_angle"] = knee[bottom]
+    reps["depth_ok"] = hip_y[bottom] >= knee_y[bottom]
+    reps["lockout_ok"] = (knee[end] >= lockout_angle) & (hip[end] >= lockout_angle)
+    return reps
+
+
+def analyse_press(keypoints, fps, lockout_angle=160.0):
+    """
+    Segment bench or overhead press reps on the elbow angle, and check that the
+    elbows are locked out at the end of each rep.
+    """
+    elbow = joint_angles(keypoints)["elbow"]
+    reps = segment_reps(elbow, fps)
+    elbow = smooth(elbow)
+    reps["bottom_elbow_angle"] = elbow[reps["bottom"]]
+    reps["lockout_ok"] = elbow[reps["end"]] >= lockout_angle
+    return reps
+
+
+EXERCISE_RULES = {
+    "squat": analyse_squat,
+    "bench press": analyse_press,
+    "overhead press": analyse_press,
+}
+
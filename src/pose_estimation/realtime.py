@@ -0,0 +1,314 @@
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+import cv2
+import numpy as np
+
+from src.pose_estimation.kinematics import joint_angles, segment_reps
+from src.pose_estimation.video import pose_arrays
+
+
+class LatestQueue:
+    """
+    Single-slot queue between two pipeline stages: a new item replaces the one
+    not consumed yet, so a slow consumer always gets the freshest frame and
+    latency does not build up. Replaced items are counted as dropped.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=1)
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def put(self, item):
+        with self._lock:
+            try:
+                self._queue.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+            self._queue.put_nowait(item)
+
+    def get(self, timeout=None):
+        return self._queue.get(timeout=timeout)
+
+
+class PipelineMetrics:
+    """Rolling per-stage latencies and end-to-end frame rate."""
+
+    def __init__(self, window=100):
+        self._latencies = {}
+        self._rendered = deque(maxlen=window)
+        self._window = window
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self._latencies.setdefault(stage, deque(maxlen=self._window)).append(
+                seconds
+            )
+
+    def frame_rendered(self, captured_at):
+        now = time.perf_counter()
+        self.record("end_to_end", now - captured_at)
+        with self._lock:
+            self._rendered.append(now)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = {
+                stage: 1000 * float(np.mean(values))
+                for stage, values in self._latencies.items()
+            }
+            rendered = list(self._rendered)
+        fps = (
+            (len(rendered) - 1) / (rendered[-1] - rendered[0])
+            if len(rendered) > 1 and rendered[-1] > rendered[0]
+            else 0.0
+        )
+        return {"latency_ms": latencies, "fps": fps}
+
+
+@dataclass
+class LiveFrame:
+    index: int
+    image: np.ndarray
+    captured_at: float
+    result: object = None
+    keypoints: np.ndarray = None
+    angles: dict = field(default_factory=dict)
+    # Reps counted since the start of the stream
+    reps: int = 0
+
+
+class VideoFileCamera:
+    """
+    Fake camera replaying a video file at its native frame rate, to test the
+    live pipeline offline. Frames are skipped, like on a real camera, when
+    reads fall behind the clock.
+    """
+
+    def __init__(self, path, loop=False):
+        self.capture = cv2.VideoCapture(path)
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 30.0
+        self.loop = loop
+        self._start = None
+        self._position = 0
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def get(self, prop):
+        return self.capture.get(prop)
+
+    def read(self):
+        if self._start is None:
+            self._start = time.perf_counter()
+        due = int((time.perf_counter() - self._start) * self.fps)
+        # Drop the frames a live camera would have produced in the meantime
+        while self._position < due:
+            if not self.capture.grab():
+                return self._end_of_file()
+            self._position += 1
+        wait = self._start + self._position / self.fps - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        ok, frame = self.capture.read()
+        if not ok:
+            return self._end_of_file()
+        self._position += 1
+        return ok, frame
+
+    def _end_of_file(self):
+        if not self.loop:
+            return False, None
+        self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        self._start, self._position = None, 0
+        return self.read()
+
+    def release(self):
+        self.capture.release()
+
+
+def open_camera(source):
+    """
+    Camera index (e.g. 0 or "0"), RTSP/HTTP stream URL, or a video file
+    replayed in real time.
+    """
+    if isinstance(source, int) or str(source).isdigit():
+        return cv2.VideoCapture(int(source))
+    if str(source).startswith(("rtsp://", "http://", "https://")):
+        capture = cv2.VideoCapture(source)
+        # Keep OpenCV from buffering stale frames
+        capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return capture
+    return VideoFileCamera(source)
+
+
+class LivePoseEstimator:
+    """
+    Real-time pose analysis: capture -> inference -> analysis -> render, each
+    stage in its own thread and linked by single-slot queues that drop stale
+    frames.
+
+    Iterate over frames() from the render thread to get the analysed frames,
+    and read metrics.snapshot() for per-stage latency and end-to-end FPS.
+    """
+
+    def __init__(
+        self,
+        model,
+        source,
+        device="cpu",
+        imgsz=640,
+        angle="knee",
+        rep_window=10.0,
+        assumed_fps=30.0,
+    ):
+        self.model = model
+        self.source = source
+        self.device = device
+        self.imgsz = imgsz
+        self.angle = angle
+        self.metrics = PipelineMetrics()
+        self._captured = LatestQueue()
+        self._inferred = LatestQueue()
+        self._analysed = LatestQueue()
+        self._stop = threading.Event()
+        self._fps = assumed_fps
+        # Recent angle samples (sample number, capture time, angle) used to
+        # count reps
+        self._history = deque(maxlen=int(rep_window * assumed_fps))
+        self._n_samples = 0
+        self._last_rep_sample = -1
+        self._reps = 0
+        self._threads = [
+            threading.Thread(target=self._capture, daemon=True),
+            threading.Thread(target=self._infer, daemon=True),
+            threading.Thread(target=self._analyse, daemon=True),
+        ]
+        self.error = None
+
+    @property
+    def dropped(self):
+        return {
+            "capture": self._captured.dropped,
+            "inference": self._inferred.dropped,
+            "analysis": self._analysed.dropped,
+        }
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=2)
+
+    @property
+    def running(self):
+        return not self._stop.is_set()
+
+    def _stage(self, stage, inbox, outbox, process):
+        while not self._stop.is_set():
+            try:
+                frame = inbox.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if frame is None:
+                outbox.put(None)
+                return
+            start = time.perf_counter()
+            try:
+                process(frame)
+            except Exception as e:
+                self.error = e
+                self._stop.set()
+                return
+            self.metrics.record(stage, time.perf_counter() - start)
+            outbox.put(frame)
+
+    def _capture(self):
+        camera = open_camera(self.source)
+        if not camera.isOpened():
+            self.error = IOError(f"Cannot open camera {self.source}")
+            self._stop.set()
+            return
+        self._fps = camera.get(cv2.CAP_PROP_FPS) or self._fps
+        index = 0
+        try:
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                ok, image = camera.read()
+                if not ok:
+                    self._captured.put(None)
+                    return
+                self.metrics.record("capture", time.perf_counter() - start)
+                self._captured.put(LiveFrame(index, image, time.perf_counter()))
+                index += 1
+        finally:
+            camera.release()
+
+    def _infer(self):
+        def process(frame):
+            frame.result = self.model(
+                frame.image, device=self.device, imgsz=self.imgsz, verbose=False
+            )[0]
+
+        self._stage("inference", self._captured, self._inferred, process)
+
+    def _analyse(self):
+        def process(frame):
+            keypoints, _, scores = pose_arrays(frame.result)
+            if len(scores):
+                height, width = frame.image.shape[:2]
+                best = keypoints[np.argmax(scores)] * [width, height, 1.0]
+                frame.keypoints = best
+                frame.angles = {
+                    name: float(values[0])
+                    for name, values in joint_angles(best[None]).items()
+                }
+                # Frames without a visible joint would be interpolated across
+                if np.isfinite(frame.angles[self.angle]):
+                    self._history.append(
+                        (self._n_samples, frame.captured_at, frame.angles[self.angle])
+                    )
+                    self._n_samples += 1
+            if len(self._history) > 2:
+                samples, times, angles = np.array(self._history).T
+                # Frames are dropped when analysis lags: segment at the rate
+                # samples were actually analysed, not at the camera rate
+                rate = (len(times) - 1) / (times[-1] - times[0] or 1 / self._fps)
+                bottoms = samples[segment_reps(angles, rate)["bottom"]]
+                # Only count reps that were not already seen in a previous window
+                self._reps += int(np.sum(bottoms > self._last_rep_sample))
+                if len(bottoms):
+                    self._last_rep_sample = max(self._last_rep_sample, bottoms[-1])
+            frame.reps = self._reps
+
+        self._stage("analysis", self._inferred, self._analysed, process)
+
+    def frames(self, timeout=5.0):
+        """
+        Yield the latest analysed frames until the source ends or stop() is
+        called. Call from the render loop.
+        """
+        while not self._stop.is_set():
+            try:
+                frame = self._analysed.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            if frame is None:
+                break
+            start = time.perf_counter()
+            yield frame
+            self.metrics.record("render", time.perf_counter() - start)
+            self.metrics.frame_rendered(frame.captured_at)
+        self._stop.set()
+        if self.error is not None:
+            raise self.error
@@ -0,0 +1,182 @@
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from src.pose_estimation.kinematics import MIN_CONFIDENCE
+
+
+def box_iou(a, b):
+    """Pairwise IoU of two sets of xyxy boxes (n x 4 and m x 4) -> (n x m)."""
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-12), 0.0)
+
+
+def keypoint_distance(a, b, boxes, min_confidence=MIN_CONFIDENCE):
+    """
+    Pairwise mean distance between the joints visible in both poses (n x 17 x 3
+    and m x 17 x 3), relative to the diagonal of the first poses' boxes. Pairs
+    without common visible joint get 1.
+    """
+    visible = (a[:, None, :, 2] >= min_confidence) & (
+        b[None, :, :, 2] >= min_confidence
+    )
+    distance = np.linalg.norm(a[:, None, :, :2] - b[None, :, :, :2], axis=3)
+    n_visible = visible.sum(axis=2)
+    mean = np.where(visible, distance, 0.0).sum(axis=2) / np.maximum(n_visible, 1)
+    scale = np.linalg.norm(boxes[:, 2:] - boxes[:, :2], axis=1)[:, None]
+    return np.where(n_visible > 0, mean / np.maximum(scale, 1e-12), 1.0)
+
+
+class PoseTracker:
+    """
+    Associate pose detections across frames and give each person a track id.
+
+    Detections are matched to the predicted position of the live tracks
+    (constant velocity) with the Hungarian algorithm, on a cost mixing box IoU
+    and keypoint distance. Unmatched detections start new tracks; tracks
+    unmatched for more than max_age frames are dropped. Tracks become
+    confirmed after min_hits matched frames.
+
+    Parameters:
+    - iou_weight: Weight of (1 - IoU) in the cost, the rest goes to the
+      keypoint distance.
+    - max_cost: Pairs with a higher cost are never matched.
+    - max_age: Number of frames a track survives without detection.
+    - min_hits: Number of detections before a track is confirmed.
+    """
+
+    def __init__(self, iou_weight=0.5, max_cost=0.7, max_age=15, min_hits=3):
+        self.iou_weight = iou_weight
+        self.max_cost = max_cost
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.next_id = 0
+        self.ids = np.empty(0, dtype=np.int64)
+        self.boxes = np.empty((0, 4))
+        self.keypoints = np.empty((0, 17, 3))
+        self.box_velocity = np.empty((0, 4))
+        self.keypoint_velocity = np.empty((0, 17, 2))
+        self.hits = np.empty(0, dtype=np.int64)
+        self.last_frame = np.empty(0, dtype=np.int64)
+        self.history = {}
+
+    def _predict(self, frame_index):
+        elapsed = (frame_index - self.last_frame)[:, None]
+        boxes = self.boxes + self.box_velocity * elapsed
+        keypoints = self.keypoints.copy()
+        keypoints[..., :2] += self.keypoint_velocity * elapsed[..., None]
+        return boxes, keypoints
+
+    def cost_matrix(self, frame_index, boxes, keypoints):
+        predicted_boxes, predicted_keypoints = self._predict(frame_index)
+        iou_cost = 1.0 - box_iou(predicted_boxes, boxes)
+        keypoint_cost = np.minimum(
+            keypoint_distance(predicted_keypoints, keypoints, predicted_boxes), 1.0
+        )
+        return self.iou_weight * iou_cost + (1 - self.iou_weight) * keypoint_cost
+
+    def update(self, frame_index, boxes, keypoints):
+        """
+        Match the detections of one frame (boxes n x 4 xyxy, keypoints
+        n x 17 x 3, same pixel units) and return their track ids, -1 for
+        detections of tracks that are not confirmed yet.
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        keypoints = np.asarray(keypoints, dtype=np.float64).reshape(-1, 17, 3)
+        n = len(boxes)
+
+        track_rows = np.full(n, -1)
+        if len(self.ids) and n:
+            cost = self.cost_matrix(frame_index, boxes, keypoints)
+            rows, cols = linear_sum_assignment(cost)
+            keep = cost[rows, cols] <= self.max_cost
+            track_rows[cols[keep]] = rows[keep]
+
+        matched = track_rows >= 0
+        rows, detections = track_rows[matched], np.flatnonzero(matched)
+        if len(rows):
+            elapsed = (frame_index - self.last_frame[rows])[:, None]
+            self.box_velocity[rows] = (boxes[detections] - self.boxes[rows]) / elapsed
+            self.keypoint_velocity[rows] = (
+                keypoints[detections, :, :2] - self.keypoints[rows, :, :2]
+            ) / elapsed[..., None]
+            self.boxes[rows] = boxes[detections]
+            self.keypoints[rows] = keypoints[detections]
+            self.hits[rows] += 1
+            self.last_frame[rows] = frame_index
+
+        # Track birth
+        new = np.flatnonzero(~matched)
+        if len(new):
+            new_ids = np.arange(self.next_id, self.next_id + len(new))
+            self.next_id += len(new)
+            self.ids = np.concatenate([self.ids, new_ids])
+            self.boxes = np.concatenate([self.boxes, boxes[new]])
+            self.keypoints = np.concatenate([self.keypoints, keypoints[new]])
+            self.box_velocity = np.concatenate([self.box_velocity, np.zeros((len(new), 4))])
+            self.keypoint_velocity = np.concatenate(
+                [self.keypoint_velocity, np.zeros((len(new), 17, 2))]
+            )
+            self.hits = np.concatenate([self.hits, np.ones(len(new), dtype=np.int64)])
+            self.last_frame = np.concatenate(
+                [self.last_frame, np.full(len(new), frame_index)]
+            )
+            track_rows[new] = np.arange(len(self.ids) - len(new), len(self.ids))
+
+        detection_ids = self.ids[track_rows]
+        for detection, track_id in zip(range(n), detection_ids):
+            self.history.setdefault(track_id, ([], []))
+            self.history[track_id][0].append(frame_index)
+            self.history[track_id][1].append(keypoints[detection])
+        confirmed = self.hits[track_rows] >= self.min_hits
+
+        # Track death
+        alive = frame_index - self.last_frame <= self.max_age
+        if not alive.all():
+            for name in (
+                "ids",
+                "boxes",
+                "keypoints",
+                "box_velocity",
+                "keypoint_velocity",
+                "hits",
+                "last_frame",
+            ):
+                setattr(self, name, getattr(self, name)[alive])
+
+        return np.where(confirmed, detection_ids, -1)
+
+    def series(self, min_length=None):
+        """
+        Keypoint time series of every track seen so far:
+        {track id: (frame indices, frames x 17 x 3 keypoints)}. Tracks shorter
+        than min_length (default: min_hits) frames are left out.
+        """
+        min_length = self.min_hits if min_length is None else min_length
+        return {
+            track_id: (np.array(frames), np.stack(keypoints))
+            for track_id, (frames, keypoints) in self.history.items()
+            if len(frames) >= min_length
+        }
+
+
+def track_poses(tracks, **tracker_options):
+    """
+    Run the tracker over a track file (see video.TrackWriter) and return the
+    per-person keypoint series in pixels, {track id: (frame indices, keypoints)}.
+    """
+    scale = np.array([*tracks["frame_size"], 1.0])
+    frame_index = tracks["frame_index"]
+    keypoints = tracks["keypoints"].astype(np.float64) * scale
+    boxes = tracks["boxes"].astype(np.float64) * np.tile(tracks["frame_size"], 2)
+    tracker = PoseTracker(**tracker_options)
+    # Detections are stored frame by frame, split them at frame changes
+    bounds = np.flatnonzero(np.diff(frame_index)) + 1
+    for rows in np.split(np.arange(len(frame_index)), bounds):
+        if len(rows):
+            tracker.update(frame_index[rows[0]], boxes[rows], keypoints[rows])
+    return tracker.series()
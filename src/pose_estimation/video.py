@@ -0,0 +1,254 @@
+import os
+import queue
+import tempfile
+import threading
+
+import cv2
+import numpy as np
+
+N_JOINTS = 17
+
+
+class FrameReader(threading.Thread):
+    """
+    Decode the frames of a video in a background thread into a bounded queue.
+
+    Only sampled frames are decoded: skipped frames are grabbed without being
+    retrieved. Sampling keeps one frame every `stride` frames, and at most
+    `max_fps` frames per second of video.
+    """
+
+    _END = object()
+
+    def __init__(self, source, stride=1, max_fps=None, queue_size=32):
+        if max_fps is not None and max_fps <= 0:
+            raise ValueError(f"max_fps must be positive, got {max_fps}")
+        super().__init__(daemon=True)
+        self.capture = cv2.VideoCapture(source)
+        if not self.capture.isOpened():
+            raise IOError(f"Cannot open video {source}")
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_count = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.frame_size = (
+            int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        )
+        self.stride = max(1, stride)
+        if max_fps is not None and max_fps < self.fps / self.stride:
+            self.stride = max(self.stride, round(self.fps / max_fps))
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self._stop_event = threading.Event()
+
+    @property
+    def output_fps(self):
+        return self.fps / self.stride
+
+    def run(self):
+        index = 0
+        try:
+            while not self._stop_event.is_set():
+                if not self.capture.grab():
+                    break
+                if index % self.stride == 0:
+                    ok, frame = self.capture.retrieve()
+                    if not ok:
+                        break
+                    self._put((index, frame))
+                index += 1
+        except Exception as e:
+            self.error = e
+        finally:
+            self.capture.release()
+            self._put(self._END)
+
+    def _put(self, item):
+        while not self._stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def stop(self):
+        self._stop_event.set()
+
+    def __iter__(self):
+        while True:
+            item = self.queue.get()
+            if item is self._END:
+                if self.error is not None:
+                    raise self.error
+                return
+            yield item
+
+
+def iter_batches(frames, batch_size):
+    batch = []
+    for item in frames:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class TrackWriter:
+    """
+    Write pose detections to a compact .npz track file without keeping them in
+    memory: detections are appended to temporary raw files and only assembled
+    (in chunks, through memory maps) when the writer is closed.
+
+    The track file holds, one row per detected person:
+    - frame_index (int32): index of the frame in the source video
+    - keypoints (float16, n x 17 x 3): x, y normalized by the frame size, and
+      confidence
+    - boxes (float16, n x 4): normalized xyxy box
+    - scores (float16, n): box confidence
+    plus fps, stride and frame_size of the source.
+    """
+
+    _FIELDS = {
+        "frame_index": (np.int32, ()),
+        "keypoints": (np.float16, (N_JOINTS, 3)),
+        "boxes": (np.float16, (4,)),
+        "scores": (np.float16, ()),
+    }
+
+    def __init__(self, path, fps, stride, frame_size):
+        self.path = path
+        self.metadata = {
+            "fps": np.float32(fps),
+            "stride": np.int32(stride),
+            "frame_size": np.array(frame_size, dtype=np.int32),
+        }
+        self.n_rows = 0
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self._files = {
+            name: open(os.path.join(self._tmpdir.name, name), "wb")
+            for name in self._FIELDS
+        }
+
+    def write(self, frame_index, keypoints, boxes, scores):
+        n = len(scores)
+        if n == 0:
+            return
+        values = {
+            "frame_index": np.full(n, frame_index),
+            "keypoints": keypoints,
+            "boxes": boxes,
+            "scores": scores,
+        }
+        for name, (dtype, _) in self._FIELDS.items():
+            self._files[name].write(np.ascontiguousarray(values[name], dtype).tobytes())
+        self.n_rows += n
+
+    def close(self):
+        arrays = dict(self.metadata)
+        for name, (dtype, shape) in self._FIELDS.items():
+            self._files[name].close()
+            file_path = os.path.join(self._tmpdir.name, name)
+            if self.n_rows == 0:
+                arrays[name] = np.empty((0, *shape), dtype)
+            else:
+                arrays[name] = np.memmap(
+                    file_path, dtype=dtype, mode="r", shape=(self.n_rows, *shape)
+                )
+        np.savez_compressed(self.path, **arrays)
+        del arrays
+        self._tmpdir.cleanup()
+
+
+def open_video_writer(path, fps, frame_size):
+    # H.264 plays in browsers, fall back to MPEG-4 if OpenCV lacks the encoder
+    for codec in ("avc1", "mp4v"):
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, frame_size)
+        if writer.isOpened():
+            return writer
+    raise IOError(f"Cannot open a video writer for {path}")
+
+
+def estimate_video_poses(
+    model,
+    source,
+    output_video=None,
+    track_path=None,
+    stride=1,
+    max_fps=None,
+    batch_size=8,
+    device="cpu",
+    on_progress=None,
+):
+    """
+    Run pose estimation on a video, streaming frames through the model.
+
+    Parameters:
+    - model: A YOLO pose model.
+    - source: Path of the input video.
+    - output_video: Path of the annotated video to write (optional).
+    - track_path: Path of the .npz track file to write (optional).
+    - stride: Keep one frame every `stride` frames.
+    - max_fps: Maximum number of frames per second of video to analyse.
+    - batch_size: Number of frames per inference call.
+    - on_progress: Called with (frames read, total frames) after each batch.
+
+    Memory use is bounded by the frame queue and one batch, whatever the
+    length of the video. Returns the number of frames analysed.
+    """
+    reader = FrameReader(source, stride=stride, max_fps=max_fps, queue_size=2 * batch_size)
+    writer = tracks = None
+    if output_video is not None:
+        writer = open_video_writer(output_video, reader.output_fps, reader.frame_size)
+    if track_path is not None:
+        tracks = TrackWriter(track_path, reader.fps, reader.stride, reader.frame_size)
+
+    n_frames = 0
+    reader.start()
+    try:
+        for batch in iter_batches(reader, batch_size):
+            indices = [index for index, _ in batch]
+            frames = [frame for _, frame in batch]
+            results = model(
+                frames, stream=True, batch=len(frames), device=device, verbose=False
+            )
+            for index, result in zip(indices, results):
+                if tracks is not None:
+                    tracks.write(index, *pose_arrays(result))
+                if writer is not None:
+                    writer.write(result.plot())
+            n_frames += len(frames)
+            if on_progress is not None:
+                on_progress(indices[-1] + 1, reader.frame_count)
+    finally:
+        reader.stop()
+        if writer is not None:
+            writer.release()
+        if tracks is not None:
+            tracks.close()
+    return n_frames
+
+
+def pose_arrays(result):
+    """
+    Keypoints (n x 17 x 3, normalized xy and confidence), normalized boxes and
+    box scores of the persons detected in one YOLO result.
+    """
+    if result.keypoints is None or result.boxes is None or len(result.boxes) == 0:
+        return (
+            np.empty((0, N_JOINTS, 3), np.float32),
+            np.empty((0, 4), np.float32),
+            np.empty(0, np.float32),
+        )
+    xyn = result.keypoints.xyn.cpu().numpy()
+    conf = result.keypoints.conf
+    conf = (
+        np.ones(xyn.shape[:2], np.float32) if conf is None else conf.cpu().numpy()
+    )
+    keypoints = np.concatenate([xyn, conf[..., None]], axis=-1)
+    return keypoints, result.boxes.xyxyn.cpu().numpy(), result.boxes.conf.cpu().numpy()
+
+
+def load_tracks(path):
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
@@ -0,0 +1,146 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from src.workout_log.log_store import WorkoutLogStore, parse_log_dates
+from src.workout_log.records import LIFT_KEY, PersonalRecords
+from src.workout_log.training_load import TrainingLoad
+
+DEFAULT_LOGS_DIR = os.path.join("data", "workout_logs")
+TOP_LIFTS = 10
+
+
+def discover_user_logs(logs_dir=DEFAULT_LOGS_DIR) -> list:
+    """
+    Usernames with a workout log in logs_dir, either a Parquet store
+    (<username>/) or a legacy CSV log (<username>.csv).
+    """
+    logs_dir = Path(logs_dir)
+    users = {path.stem for path in logs_dir.glob("*.csv")}
+    users.update(
+        path.name
+        for path in logs_dir.iterdir()
+        if path.is_dir() and WorkoutLogStore(logs_dir, path.name).exists()
+    )
+    return sorted(users)
+
+
+def load_user_log(logs_dir, username: str) -> pd.DataFrame:
+    """The log of a user, from its Parquet store if migrated, else its CSV."""
+    store = WorkoutLogStore(logs_dir, username)
+    if store.exists():
+        return store.read()
+    return pd.read_csv(Path(logs_dir) / f"{username}.csv", delimiter=",")
+
+
+def user_aggregates(logs_dir, username: str) -> dict:
+    """
+    Per-user partial results merged by run_gym_analytics: all-time records,
+    active weeks and weekly sets per muscle, with the time spent on each step.
+    Runs in a worker process.
+    """
+    start = time.perf_counter()
+    df = load_user_log(logs_dir, username)
+    loaded = time.perf_counter()
+
+    records = PersonalRecords.build(df).records().reset_index()
+    dates = parse_log_dates(df["Date"]).dropna()
+    active_weeks = dates.dt.normalize() - pd.to_timedelta(dates.dt.dayofweek, "D")
+    weekly_sets = TrainingLoad(df).weekly_sets() if len(dates) else pd.DataFrame()
+    done = time.perf_counter()
+
+    return {
+        "username": username,
+        "records": records.assign(User=username),
+        "active_weeks": pd.Series(active_weeks.unique(), name="Week"),
+        # Weeks without any set are not counted in the user's average
+        "muscle_volume": weekly_sets[weekly_sets.sum(axis=1) > 0]
+        .mean()
+        .rename(username),
+        "timing": {
+            "User": username,
+            "Sets": len(df),
+            "Load (s)": loaded - start,
+            "Compute (s)": done - loaded,
+        },
+    }
+
+
+def _user_aggregates(args):
+    return user_aggregates(*args)
+
+
+def merge_aggregates(partials, top=TOP_LIFTS) -> dict:
+    """
+    Merge per-user results into gym-wide tables:
+    - top_lifts: the `top` best weights of every lift, with their user and date
+    - weekly_active_users: number of users who logged a set each week
+    - muscle_volume: distribution across users of the average weekly sets per
+      muscle
+    - timings: per-user load and compute times
+    """
+    records = pd.concat([p["records"] for p in partials], ignore_index=True)
+    top_lifts = (
+        records.sort_values("Best Weight", ascending=False, kind="stable")
+        .groupby(LIFT_KEY, sort=True)
+        .head(top)
+        .loc[:, LIFT_KEY + ["User", "Best Weight", "Best Weight date"]]
+        .sort_values(LIFT_KEY + ["Best Weight"], ascending=[True] * 3 + [False])
+        .reset_index(drop=True)
+    )
+    weekly_active_users = (
+        pd.concat([p["active_weeks"] for p in partials], ignore_index=True)
+        .value_counts()
+        .sort_index()
+        .rename("Active users")
+    )
+    muscle_volume = (
+        pd.concat([p["muscle_volume"] for p in partials], axis=1)
+        .T.describe(percentiles=[0.25, 0.5, 0.75])
+        .T
+    )
+    timings = pd.DataFrame([p["timing"] for p in partials]).set_index("User")
+    return {
+        "top_lifts": top_lifts,
+        "weekly_active_users": weekly_active_users,
+        "muscle_volume": muscle_volume,
+        "timings": timings,
+    }
+
+
+def run_gym_analytics(
+    logs_dir=DEFAULT_LOGS_DIR, usernames=None, max_workers=None, chunksize=None
+) -> dict:
+    """
+    Compute the gym-wide tables of merge_aggregates over every user log of
+    logs_dir. Users are spread over a process pool in chunks (by default four
+    chunks per worker, to balance uneven log sizes without paying a round trip
+    per user), and the partial results are merged in the parent process.
+    """
+    usernames = discover_user_logs(logs_dir) if usernames is None else usernames
+    max_workers = max_workers or os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, len(usernames) // (max_workers * 4))
+    tasks = [(logs_dir, username) for username in usernames]
+
+    if max_workers == 1 or len(tasks) < 2:
+        partials = list(map(_user_aggregates, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            partials = list(pool.map(_user_aggregates, tasks, chunksize=chunksize))
+    return merge_aggregates(partials)
+
+
+if __name__ == "__main__":
+    logs_dir = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_LOGS_DIR
+    start = time.perf_counter()
+    tables = run_gym_analytics(logs_dir)
+    elapsed = time.perf_counter() - start
+    with pd.option_context("display.width", 160, "display.max_columns", 20):
+        for name, table in tables.items():
+            print(f"== {name}\n{table}\n")
+    print(f"{len(tables['timings'])} users in {elapsed:.2f} s")
@@ -0,0 +1,116 @@
+import base64
+import io
+
+from PIL import Image, ImageOps
+
+# GPT-4o (high detail) fits images in a 2048x2048 square, then scales the
+# short side down to 768 px and bills 512 px tiles. Anything bigger is
+# uploaded for nothing.
+TILE_SIZE = 512
+MAX_LONG_EDGE = 2048
+MAX_SHORT_EDGE = 768
+DEFAULT_BYTE_BUDGET = 250_000
+
+
+def fit_tile_grid(
+    width, height, max_long_edge=MAX_LONG_EDGE, max_short_edge=MAX_SHORT_EDGE
+):
+    """
+    Size of the image once resized to fit the model's tile grid, keeping the
+    aspect ratio. Images are never upscaled.
+    """
+    long_edge, short_edge = max(width, height), min(width, height)
+    scale = min(1.0, max_long_edge / long_edge, max_short_edge / short_edge)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def crop_to_text(img: Image.Image, margin=0.02) -> Image.Image:
+    """
+    Crop a grayscale image to the bounding box of its dark (ink) pixels, plus a
+    margin relative to the image size.
+    """
+    histogram = img.histogram()
+    n_pixels = img.width * img.height
+    mean = sum(i * count for i, count in enumerate(histogram)) / n_pixels
+    # Ink is clearly darker than the paper
+    threshold = mean * 0.7
+    bbox = img.point(lambda p: 255 if p < threshold else 0).getbbox()
+    if bbox is None:
+        return img
+    dx, dy = round(img.width * margin), round(img.height * margin)
+    left, top, right, bottom = bbox
+    return img.crop(
+        (
+            max(0, left - dx),
+            max(0, top - dy),
+            min(img.width, right + dx),
+            min(img.height, bottom + dy),
+        )
+    )
+
+
+def encode_to_budget(img: Image.Image, byte_budget, min_quality=30, max_quality=95):
+    """
+    Encode as JPEG with the highest quality that fits in byte_budget, found by
+    binary search. If even min_quality is too big, the image is downscaled
+    until it fits.
+    """
+    while True:
+        best = None
+        low, high = min_quality, max_quality
+        while low <= high:
+            quality = (low + high) // 2
+            buffer = io.BytesIO()
+            img.save(buffer, format="JPEG", quality=quality, optimize=True)
+            if buffer.tell() <= byte_budget:
+                best = buffer
+                low = quality + 1
+            else:
+                high = quality - 1
+        if best is not None or min(img.size) <= 64:
+            return (best or buffer).getvalue()
+        img = img.resize(
+            (round(img.width * 0.75), round(img.height * 0.75)), Image.LANCZOS
+        )
+
+
+def preprocess_image_for_ocr(
+    input_img,
+    byte_budget=DEFAULT_BYTE_BUDGET,
+    max_long_edge=MAX_LONG_EDGE,
+    max_short_edge=MAX_SHORT_EDGE,
+    grayscale=True,
+    crop_text=False,
+):
+    """
+    Prepare a photo of handwritten notes for the MLLM.
+
+    Parameters:
+    - input_img: The input image in bytes.
+    - byte_budget: Maximum size of the encoded JPEG, in bytes.
+    - max_long_edge, max_short_edge: Target resolution (the model's tile grid).
+    - grayscale: Convert to grayscale and stretch the contrast of the ink.
+    - crop_text: Crop to the region containing text before resizing.
+
+    Returns the base64-encoded JPEG.
+    """
+    img = Image.open(io.BytesIO(input_img))
+    target = fit_tile_grid(*img.size, max_long_edge, max_short_edge)
+    # Let the JPEG decoder downscale by a power of two while decoding, so
+    # large photos are never fully decoded
+    img.draft("L" if grayscale else "RGB", target)
+    img = ImageOps.exif_transpose(img)
+
+    if grayscale:
+        img = ImageOps.grayscale(img)
+        if crop_text:
+            img = crop_to_text(img)
+        img = ImageOps.autocontrast(img, cutoff=1)
+    else:
+        img = img.convert("RGB")
+
+    target = fit_tile_grid(*img.size, max_long_edge, max_short_edge)
+    if target != img.size:
+        img = img.resize(target, Image.LANCZOS, reducing_gap=3.0)
+
+    return base64.b64encode(encode_to_budget(img, byte_budget)).decode("utf-8")
@@ -0,0 +1,68 @@
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from src.workout_log.log_store import WorkoutLogStore, parse_log_dates
+
+# Explicit dtypes of the CSV logs: text columns are categoricals (a log repeats
+# the same few names, dates and remarks on every set), numbers are float32
+LOG_CSV_DTYPES = {
+    "Date": "category",
+    "Workout name": "category",
+    "Workout type": "category",
+    "Set number ": "float32",
+    "Exercise name": "category",
+    "Equipment": "category",
+    "Execution mode": "category",
+    "Number of repetitions": "float32",
+    "Charge (kg)": "float32",
+    "Rest time (sec)": "float32",
+    "Remarks": "category",
+}
+DEFAULT_ENGINE = "pyarrow"
+
+
+def read_log_csv(path, engine=DEFAULT_ENGINE) -> pd.DataFrame:
+    """
+    Read a CSV workout log with typed columns. Dates are parsed once, with the
+    fixed log formats, into a datetime column ('engine' is passed to
+    pd.read_csv, "pyarrow" reads with several threads).
+    """
+    df = pd.read_csv(path, delimiter=",", dtype=LOG_CSV_DTYPES, engine=engine)
+    # Dates are read as categoricals so that each distinct day is parsed once
+    df["Date"] = parse_log_dates(df["Date"])
+    if not df["Set number "].isna().any():
+        df["Set number "] = df["Set number "].astype("int16")
+    return df
+
+
+def load_workout_log(path, engine=DEFAULT_ENGINE) -> pd.DataFrame:
+    """
+    Typed workout log from a Parquet log store directory (<root>/<username>)
+    or a CSV log file.
+    """
+    path = Path(path)
+    if path.is_dir():
+        return WorkoutLogStore(path.parent, path.name).read()
+    return read_log_csv(path, engine=engine)
+
+
+def log_signature(path) -> tuple:
+    """
+    Cheap fingerprint of a log file or store directory: number of data files,
+    latest modification time and total size. It changes whenever the log is
+    written to, so it can be used as a cache key. The sidecar files of a
+    store (set hash index, records) are not part of it.
+    """
+    path = Path(path)
+    if path.is_dir():
+        files = WorkoutLogStore(path.parent, path.name).files()
+    else:
+        files = [path]
+    stats = [os.stat(f) for f in files if f.exists()]
+    return (
+        len(stats),
+        max((s.st_mtime_ns for s in stats), default=0),
+        sum(s.st_size for s in stats),
+    )
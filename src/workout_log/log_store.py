@@ -0,0 +1,293 @@
+import hashlib
+import os
+import sys
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Typed columns of a workout log. Low-cardinality names are stored as
+# dictionaries and come back as pandas categoricals.
+CATEGORY = pa.dictionary(pa.int16(), pa.string())
+LOG_SCHEMA = pa.schema(
+    [
+        ("Date", pa.timestamp("s")),
+        ("Workout name", pa.string()),
+        ("Workout type", CATEGORY),
+        ("Set number ", pa.int16()),
+        ("Exercise name", CATEGORY),
+        ("Equipment", CATEGORY),
+        ("Execution mode", CATEGORY),
+        ("Number of repetitions", pa.float64()),
+        ("Charge (kg)", pa.float64()),
+        ("Rest time (sec)", pa.float64()),
+        ("Remarks", pa.string()),
+        ("Set hash", pa.uint64()),
+    ]
+)
+PARTITION_SCHEMA = pa.schema([("Year", pa.int16()), ("Month", pa.int8())])
+PARTITIONING = ds.partitioning(PARTITION_SCHEMA, flavor="hive")
+DATE_FORMATS = ["%d-%m-%Y %H:%M", "%d-%m-%Y"]
+# Columns identifying a set. Free-text columns such as the remarks are left out.
+SET_KEY = [
+    "Date",
+    "Workout name",
+    "Exercise name",
+    "Set number ",
+    "Number of repetitions",
+    "Charge (kg)",
+]
+HASH_INDEX_FILE = "_set_hashes.u64"
+# Data files of a store. Sidecar files (set hash index, records) live at its
+# root and start with "_", so that the dataset scan skips them too
+DATA_FILES_GLOB = "Year=*/Month=*/*.parquet"
+
+
+def parse_log_dates(dates: pd.Series) -> pd.Series:
+    """
+    Parse the dates of a workout log. Logged workouts use '%d-%m-%Y %H:%M',
+    older CSV logs only store the day ('%d-%m-%Y').
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates
+    if isinstance(dates.dtype, pd.CategoricalDtype):
+        # Parse each distinct date once, code -1 (missing) picks the NaT
+        categories = parse_log_dates(pd.Series(dates.cat.categories, dtype=object))
+        values = np.append(categories.to_numpy(), np.datetime64("NaT", "s"))
+        return pd.Series(values[dates.cat.codes.to_numpy()], index=dates.index)
+    parsed = pd.Series(pd.NaT, index=dates.index, dtype="datetime64[s]")
+    for date_format in DATE_FORMATS:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(
+            dates[missing], format=date_format, errors="coerce"
+        )
+    return parsed
+
+
+def set_hashes(df: pd.DataFrame) -> pd.Series:
+    """
+    Stable 64-bit content hash of each set, computed on the SET_KEY columns.
+    Dates and numbers are normalized first, so that the same set gets the same
+    hash whether it comes from a CSV log, the Parquet store or a new parse.
+    """
+    dates = parse_log_dates(df["Date"]).dt.strftime("%Y-%m-%d %H:%M")
+    columns = [dates.fillna(df["Date"].map(str)).tolist()]
+    for column in SET_KEY[1:]:
+        values = df[column]
+        if pd.api.types.is_numeric_dtype(values):
+            values = values.astype(float).map("{:g}".format)
+        columns.append(values.astype(object).map(str).tolist())
+    hashes = [
+        int.from_bytes(
+            hashlib.blake2b("|".join(key).encode(), digest_size=8).digest(),
+            "little",
+        )
+        for key in zip(*columns)
+    ]
+    return pd.Series(hashes, index=df.index, dtype="uint64", name="Set hash")
+
+
+def to_log_table(df: pd.DataFrame) -> pa.Table:
+    """
+    Cast a workout log DataFrame (as built by workout_to_dataframe or read from
+    a CSV log) to the typed Arrow schema, with its partition columns.
+    """
+    if "Set hash" not in df.columns:
+        df = df.assign(**{"Set hash": set_hashes(df)})
+    df = df.assign(Date=parse_log_dates(df["Date"]))
+    df = df.dropna(subset=["Date"])
+    table = pa.Table.from_pandas(
+        df[LOG_SCHEMA.names], schema=LOG_SCHEMA, preserve_index=False
+    )
+    return table.append_column(
+        "Year", pa.array(df["Date"].dt.year, pa.int16())
+    ).append_column("Month", pa.array(df["Date"].dt.month, pa.int8()))
+
+
+class WorkoutLogStore:
+    """
+    Append-only workout log of one user, stored as Parquet files partitioned by
+    year and month under <root>/<username>/.
+
+    Saving only writes the new rows, checked against a persisted index of set
+    hashes; reading filters by date range and exercise so that only the
+    matching partitions and row groups are scanned.
+    """
+
+    def __init__(self, root, username: str):
+        self.path = Path(root) / username
+        self._hash_index = None
+
+    def files(self) -> list:
+        """Parquet files of the partitions, without the sidecar files."""
+        return sorted(self.path.glob(DATA_FILES_GLOB))
+
+    def exists(self) -> bool:
+        return self.path.is_dir() and any(self.path.glob(DATA_FILES_GLOB))
+
+    def dataset(self) -> ds.Dataset:
+        return ds.dataset(
+            self.path,
+            schema=pa.unify_schemas([LOG_SCHEMA, PARTITION_SCHEMA]),
+            format="parquet",
+            partitioning=PARTITIONING,
+            ignore_prefixes=[".", "_"],
+        )
+
+    def hash_index(self) -> set:
+        """
+        Hashes of every stored set, loaded once from the index file (or rebuilt
+        from the stored rows if it is missing) and kept up to date by append().
+        """
+        if self._hash_index is None:
+            index_path = self.path / HASH_INDEX_FILE
+            if index_path.is_file():
+                hashes = np.fromfile(index_path, dtype="<u8")
+            elif self.exists():
+                hashes = set_hashes(self.read(columns=SET_KEY)).to_numpy()
+                self._write_hashes(hashes, mode="wb")
+            else:
+                hashes = np.empty(0, dtype="<u8")
+            self._hash_index = set(hashes.tolist())
+        return self._hash_index
+
+    def _write_hashes(self, hashes, mode="ab"):
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self.path / HASH_INDEX_FILE, mode) as f:
+            np.asarray(hashes, dtype="<u8").tofile(f)
+
+    def append(self, df: pd.DataFrame) -> int:
+        """
+        Append the rows of df whose set hash is not in the index, and return
+        how many rows were written. Runs in O(len(df)), the stored history is
+        never scanned.
+        """
+        if df.empty:
+            return 0
+        if "Set hash" not in df.columns:
+            df = df.assign(**{"Set hash": set_hashes(df)})
+        new_rows = df.drop_duplicates(subset="Set hash")
+        known = self.hash_index()
+        new_rows = new_rows[[h not in known for h in new_rows["Set hash"].tolist()]]
+        table = to_log_table(new_rows)
+        if table.num_rows == 0:
+            return 0
+
+        # Rows are written before their hashes: if the index update is lost,
+        # deleting the index file rebuilds it from the stored rows
+        self.write(table)
+        hashes = table.column("Set hash").to_numpy()
+        self._write_hashes(hashes)
+        known.update(hashes.tolist())
+        return table.num_rows
+
+    def write(self, table: pa.Table):
+        ds.write_dataset(
+            table,
+            self.path,
+            format="parquet",
+            partitioning=PARTITIONING,
+            basename_template=f"part-{datetime.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+
+    def read(
+        self,
+        start=None,
+        end=None,
+        exercises=None,
+        columns=None,
+    ) -> pd.DataFrame:
+        """
+        Read the log, optionally restricted to start <= Date < end and to a list
+        of exercise names. Filters are pushed down to the Parquet scan.
+        """
+        if not self.exists():
+            return pd.DataFrame(columns=columns or LOG_SCHEMA.names)
+
+        conditions = []
+        if start is not None:
+            start = pd.Timestamp(start)
+            conditions += [
+                ds.field("Year") >= start.year,
+                ds.field("Date") >= pa.scalar(start, pa.timestamp("s")),
+            ]
+        if end is not None:
+            end = pd.Timestamp(end)
+            conditions += [
+                ds.field("Year") <= end.year,
+                ds.field("Date") < pa.scalar(end, pa.timestamp("s")),
+            ]
+        if exercises is not None:
+            conditions.append(ds.field("Exercise name").isin(list(exercises)))
+        condition = None
+        for c in conditions:
+            condition = c if condition is None else condition & c
+
+        table = self.dataset().to_table(
+            columns=columns or LOG_SCHEMA.names, filter=condition
+        )
+        df = table.to_pandas()
+        if "Date" in df.columns:
+            df = df.sort_values("Date", kind="stable", ignore_index=True)
+        return df
+
+    def compact(self):
+        """
+        Rewrite each partition into a single file, to keep the number of small
+        files produced by repeated saves bounded.
+        """
+        for partition in sorted(self.path.glob("Year=*/Month=*")):
+            files = sorted(partition.glob("*.parquet"))
+            if len(files) < 2:
+                continue
+            table = pa.concat_tables(
+                [pq.read_table(f, schema=LOG_SCHEMA) for f in files]
+            )
+            tmp = partition / f"compact-{uuid.uuid4().hex[:8]}.parquet.tmp"
+            pq.write_table(table, tmp)
+            for f in files:
+                f.unlink()
+            tmp.rename(partition / "part-compacted-0.parquet")
+
+
+def migrate_csv_log(csv_path, store: WorkoutLogStore) -> int:
+    """
+    One-shot import of a legacy CSV log into a Parquet store. The CSV file is
+    left in place.
+    """
+    df = pd.read_csv(csv_path, delimiter=",")
+    n_rows = store.append(df)
+    store.compact()
+    return n_rows
+
+
+def migrate_csv_logs(logs_dir) -> dict:
+    """
+    Migrate every <username>.csv log of logs_dir whose Parquet store does not
+    exist yet. Returns the number of rows imported per user.
+    """
+    imported = {}
+    for csv_path in sorted(Path(logs_dir).glob("*.csv")):
+        store = WorkoutLogStore(logs_dir, csv_path.stem)
+        if store.exists():
+            continue
+        imported[csv_path.stem] = migrate_csv_log(csv_path, store)
+    return imported
+
+
+if __name__ == "__main__":
+    logs_dir = (
+        sys.argv[1]
+        if len(sys.argv) > 1
+        else os.path.join(os.getcwd(), "data", "workout_logs")
+    )
+    for username, n_rows in migrate_csv_logs(logs_dir).items():
+        print(f"{username}: {n_rows} rows migrated")
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.getcwd(), "data", "cache", "workout_parses.sqlite"
+)
+
+
+def cache_key(payload: str, model: str, system: str, schema_version: str) -> str:
+    """
+    Content address of an LLM parse: hash of the preprocessed image (base64)
+    or input text, the model name, the system prompt and the output schema
+    version. Changing any of them invalidates the cached parses.
+    """
+    h = hashlib.sha256()
+    for part in (payload, model, system, schema_version):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class ParseCache:
+    """
+    Persistent cache of LLM workout parses in a local SQLite file, evicting the
+    least recently used entries once the stored values exceed max_bytes.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=64 * 1024 * 1024):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS parses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS parses_lru ON parses (last_access)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        # One connection per operation: the cache is used from the worker
+        # threads of batched LLM calls
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str):
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM parses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute(
+                "UPDATE parses SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value):
+        data = json.dumps(value)
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO parses VALUES (?, ?, ?, ?)",
+                (key, data, len(data), time.time()),
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM parses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute(
+            "SELECT key, size FROM parses ORDER BY last_access"
+        ).fetchall():
+            conn.execute("DELETE FROM parses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM parses")
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM parses"
+            ).fetchone()
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
@@ -1,5 +1,7 @@
 import pandas as pd
 
+from src.workout_log.log_store import parse_log_dates
+
 exercise_to_muscle_map = {
     "Squat": ["Quadriceps", "Glutes"],
     "Front Squat": ["Quadriceps", "Core"],
@@ -95,29 +97,49 @@ def modified_exercise_tracker(df, exercise_name, equipment):
 
 
 # Function 2: Calculate number of sets per muscle group per week
+def muscle_lookup_table(exercise_to_muscle_map):
+    # One row per (exercise, muscle) pair, so a single merge attributes every set
+    # to all the muscles it works
+    return pd.DataFrame(
+        [
+            (exercise, muscle)
+            for exercise, muscles in exercise_to_muscle_map.items()
+            for muscle in muscles
+        ],
+        columns=["Exercise name", "Muscle"],
+    )
+
+
 def sets_per_muscle_per_week(df, exercise_to_muscle_map):
-    # Ensure the Date column is in datetime format for resampling
-    df["Date"] = pd.to_datetime(df["Date"], format="%d-%m-%Y")
-    df["Week"] = df["Date"].dt.isocalendar().week  # Extract week number for grouping
-    df["Year"] = df["Date"].dt.year  # Extract year to differentiate weeks across years
-
-    # Initialize a dictionary to hold weekly muscle group sets count
-    weekly_sets = {}
-
-    for exercise, muscles in exercise_to_muscle_map.items():
-        # Filter data for each exercise and count the sets per week
-        exercise_sets = (
-            df[df["Exercise name"] == exercise].groupby(["Year", "Week"]).size()
-        )
-        # Accumulate sets per muscle group per week
-        for muscle in muscles:
-            if muscle not in weekly_sets:
-                weekly_sets[muscle] = exercise_sets
-            else:
-                weekly_sets[muscle] = weekly_sets[muscle].add(
-                    exercise_sets, fill_value=0
-                )
-
-    # Convert the dictionary to a DataFrame for easier visualization
-    weekly_sets_df = pd.DataFrame(weekly_sets).fillna(0).astype(int)
+    # Parse dates into a local frame: the caller's DataFrame is left untouched.
+    # Typed logs (see log_loader) already hold datetimes and are not re-parsed
+    dates = parse_log_dates(df["Date"])
+    sets = pd.DataFrame(
+        {
+            "Year": dates.dt.year.to_numpy(),  # differentiate weeks across years
+            "Week": dates.dt.isocalendar().week.to_numpy(),
+            "Exercise name": df["Exercise name"].to_numpy(),
+        }
+    )
+
+    # Count sets per exercise and week first, so the merge only touches one row
+    # per (week, exercise) instead of one row per set
+    exercise_sets = sets.groupby(
+        ["Year", "Week", "Exercise name"], observed=True
+    ).size()
+    lookup = muscle_lookup_table(exercise_to_muscle_map)
+    muscle_sets = exercise_sets.rename("Sets").reset_index().merge(
+        lookup, on="Exercise name"
+    )
+
+    # Single groupby over the exploded table, then pivot muscles into columns
+    muscles = lookup["Muscle"].drop_duplicates().tolist()
+    weekly_sets_df = (
+        muscle_sets.groupby(["Year", "Week", "Muscle"])["Sets"]
+        .sum()
+        .unstack("Muscle", fill_value=0)
+        .reindex(columns=muscles, fill_value=0)
+        .rename_axis(columns=None)
+        .astype(int)
+    )
     return weekly_sets_df
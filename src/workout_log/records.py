@@ -0,0 +1,221 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.workout_log.log_store import WorkoutLogStore, parse_log_dates
+
+# A lift is identified by its exercise, equipment and execution mode: a dumbbell
+# bench press and a barbell bench press have separate records
+LIFT_KEY = ["Exercise name", "Equipment", "Execution mode"]
+DAILY_COLUMNS = [
+    "Best Weight",
+    "Number of Reps",
+    "Best Volume",
+    "e1RM (Epley)",
+    "e1RM (Brzycki)",
+]
+# Weight and reps of the heaviest set, taken from the same set
+HEAVIEST_SET = ["Best Weight", "Number of Reps"]
+DAILY_AGG = {
+    "Best Volume": "max",
+    "e1RM (Epley)": "max",
+    "e1RM (Brzycki)": "max",
+}
+# Metrics for which all-time records are tracked
+RECORD_METRICS = ["Best Weight", "Best Volume", "e1RM (Epley)"]
+RECORDS_FILE = "_records.parquet"
+
+
+def epley(weight, reps):
+    """Epley estimated 1RM, a single rep is the 1RM itself."""
+    weight = np.asarray(weight, dtype=float)
+    reps = np.asarray(reps, dtype=float)
+    return np.where(reps == 1, weight, weight * (1 + reps / 30))
+
+
+def brzycki(weight, reps):
+    """Brzycki estimated 1RM, undefined (NaN) from 37 reps on."""
+    weight = np.asarray(weight, dtype=float)
+    reps = np.asarray(reps, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(reps < 37, weight * 36 / (37 - reps), np.nan)
+
+
+def daily_bests(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Best performances of each lift and day in a single groupby pass: heaviest
+    set (and its reps), best weight x reps set and best estimated 1RMs.
+    Indexed by LIFT_KEY + Date.
+    """
+    weight = df["Charge (kg)"].to_numpy(dtype=float)
+    reps = df["Number of repetitions"].to_numpy(dtype=float)
+    sets = pd.DataFrame(
+        {
+            # A missing equipment or mode is a lift of its own, not dropped
+            **{
+                column: df[column].astype(str).fillna("None").to_numpy()
+                for column in LIFT_KEY
+            },
+            "Date": parse_log_dates(df["Date"]).dt.normalize().to_numpy(),
+            "Best Weight": weight,
+            "Number of Reps": reps,
+            "Best Volume": weight * reps,
+            "e1RM (Epley)": epley(weight, reps),
+            "e1RM (Brzycki)": brzycki(weight, reps),
+        }
+    ).dropna(subset=["Date", "Best Weight"])
+
+    return _best_of_days(sets.set_index(LIFT_KEY + ["Date"]), LIFT_KEY + ["Date"])
+
+
+def _best_of_days(sets: pd.DataFrame, level) -> pd.DataFrame:
+    # Sorted by weight then reps (missing reps first), the last set of a day
+    # is the heaviest, with the most reps among equally heavy sets. Its row
+    # gives both values: a column-wise "last" skips missing reps and could
+    # pair the weight of one set with the reps of another
+    sets = sets.sort_values(HEAVIEST_SET, kind="stable", na_position="first")
+    best = sets.groupby(level=level).agg(DAILY_AGG)
+    heaviest = sets[~sets.index.duplicated(keep="last")]
+    best[HEAVIEST_SET] = heaviest[HEAVIEST_SET]
+    return best[DAILY_COLUMNS]
+
+
+def _merge_days(history: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    # Same rule as daily_bests, applied to days present in both tables, so that
+    # updating with already indexed sets is a no-op
+    return _best_of_days(pd.concat([history, new]), "Date").sort_index()
+
+
+def _records(flat: pd.DataFrame) -> dict:
+    # All-time records of every lift of a flat (LIFT_KEY + Date columns) daily
+    # table. Sorting by a metric keeps the earliest date first among equal
+    # values, as idxmax does, and puts the NaN of sets without reps or charge
+    # last: a lift with no value for a metric gets a NaN record and no date
+    records = flat.groupby(LIFT_KEY)[RECORD_METRICS].max()
+    for metric in RECORD_METRICS:
+        best = flat.dropna(subset=[metric]).sort_values(
+            metric, ascending=False, kind="stable"
+        )
+        records[f"{metric} date"] = best.drop_duplicates(LIFT_KEY).set_index(
+            LIFT_KEY
+        )["Date"]
+    return records.to_dict("index")
+
+
+class PersonalRecords:
+    """
+    Per-lift index of a user's daily best sets and all-time records.
+
+    Built once from the whole log, then updated with newly saved sets only:
+    progress charts read a lift's history with a dict lookup instead of
+    filtering and regrouping the full log, and new records are reported at
+    ingest time.
+    """
+
+    def __init__(self, daily: pd.DataFrame = None):
+        self._history = {}
+        self._records = {}
+        if daily is None or daily.empty:
+            return
+        daily = daily.sort_index()
+
+        self._records = _records(daily.reset_index())
+
+        # Histories are built from row slices rather than one groupby frame
+        # per lift, which is much cheaper with hundreds of lifts
+        values = daily.to_numpy()
+        dates = daily.index.get_level_values("Date")
+        for key, rows in daily.groupby(level=LIFT_KEY, sort=False).indices.items():
+            self._history[key] = pd.DataFrame(
+                values[rows], index=dates[rows], columns=daily.columns
+            )
+
+    @classmethod
+    def build(cls, df: pd.DataFrame) -> "PersonalRecords":
+        return cls(daily_bests(df) if not df.empty else None)
+
+    @classmethod
+    def load(cls, store: WorkoutLogStore) -> "PersonalRecords":
+        """
+        Load the index saved next to a user's log store, or build it from the
+        stored log (and save it) if there is none yet.
+        """
+        path = store.path / RECORDS_FILE
+        if path.is_file():
+            daily = pq.read_table(path).to_pandas()
+            # Parquet stores the timestamps in ms, the log uses seconds
+            daily["Date"] = daily["Date"].astype("datetime64[s]")
+            return cls(daily.set_index(LIFT_KEY + ["Date"]))
+        records = cls.build(store.read())
+        if store.exists():
+            records.save(store)
+        return records
+
+    def save(self, store: WorkoutLogStore):
+        store.path.mkdir(parents=True, exist_ok=True)
+        tmp = store.path / f"{RECORDS_FILE}.tmp"
+        pq.write_table(
+            pa.Table.from_pandas(self.daily().reset_index(), preserve_index=False),
+            tmp,
+        )
+        tmp.replace(store.path / RECORDS_FILE)
+
+    def lifts(self) -> list:
+        return sorted(self._history)
+
+    def history(self, exercise, equipment, execution_mode) -> pd.DataFrame:
+        """Daily bests of a lift, indexed by date (empty if never logged)."""
+        history = self._history.get((exercise, equipment, execution_mode))
+        if history is None:
+            return pd.DataFrame(
+                columns=DAILY_COLUMNS, index=pd.DatetimeIndex([], name="Date")
+            )
+        return history
+
+    def records(self) -> pd.DataFrame:
+        """All-time records (value and date) of every lift."""
+        records = pd.DataFrame.from_dict(self._records, orient="index")
+        if not records.empty:
+            records.index = pd.MultiIndex.from_tuples(records.index, names=LIFT_KEY)
+        return records.sort_index()
+
+    def daily(self) -> pd.DataFrame:
+        if not self._history:
+            return pd.DataFrame(
+                columns=DAILY_COLUMNS,
+                index=pd.MultiIndex.from_tuples([], names=LIFT_KEY + ["Date"]),
+            )
+        return pd.concat(self._history, names=LIFT_KEY)
+
+    def update(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Add newly logged sets to the index. Only the lifts present in df are
+        touched. Returns the new personal records, one row per lift and
+        metric, with the previous record (NaN for a first-time lift).
+        """
+        new_prs = []
+        if df.empty:
+            return pd.DataFrame(
+                columns=LIFT_KEY + ["Metric", "Date", "Value", "Previous"]
+            )
+        for key, new in daily_bests(df).groupby(level=LIFT_KEY, sort=False):
+            new = new.droplevel(LIFT_KEY)
+            previous = self._records.get(key)
+            history = self._history.get(key)
+            history = new.sort_index() if history is None else _merge_days(history, new)
+            self._history[key] = history
+            flat = history.rename_axis("Date").reset_index()
+            flat[LIFT_KEY] = list(key)
+            self._records.update(_records(flat))
+
+            for metric in RECORD_METRICS:
+                best = new[metric].max()
+                old = previous[metric] if previous is not None else np.nan
+                if not np.isnan(best) and not best <= old:
+                    new_prs.append(
+                        (*key, metric, new[metric].idxmax(), best, old)
+                    )
+        return pd.DataFrame(
+            new_prs, columns=LIFT_KEY + ["Metric", "Date", "Value", "Previous"]
+        )
@@ -0,0 +1,211 @@
+import numpy as np
+import pandas as pd
+
+from src.workout_log.log_store import parse_log_dates
+from src.workout_log.perf_analysis import exercise_to_muscle_map
+from src.workout_log.records import LIFT_KEY, epley
+
+USER_COLUMN = "User"
+ACUTE_DAYS = 7
+CHRONIC_DAYS = 28
+
+
+def rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing sum over `window` days along axis 1, from cumulative sums."""
+    cumsum = np.cumsum(values, axis=1)
+    out = cumsum.copy()
+    out[:, window:] -= cumsum[:, :-window]
+    return out
+
+
+def _codes(values):
+    """
+    Integer codes and labels of a column, without its unused categories.
+    Missing values get the code -1, as with pd.factorize.
+    """
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        return pd.factorize(values)
+    # Drop unused categories with a bincount, cheaper than the sort done by
+    # remove_unused_categories on large columns
+    codes = values.cat.codes.to_numpy()
+    used = np.bincount(codes[codes >= 0], minlength=len(values.cat.categories)) > 0
+    remap = np.where(used, np.cumsum(used) - 1, -1)
+    return np.where(codes >= 0, remap[codes], -1), values.cat.categories[used]
+
+
+def segmented_cummax(values: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    """
+    Running maximum of non-negative values, restarted at each group. Rows must
+    be sorted by group: each group is offset above all the previous ones, so a
+    single np.maximum.accumulate never carries a maximum across groups.
+    """
+    offset = groups * (np.nanmax(values, initial=0) + 1)
+    return np.maximum.accumulate(np.nan_to_num(values) + offset) - offset
+
+
+class TrainingLoad:
+    """
+    Dense user x day x muscle matrices of a workout log (tonnage, number of
+    sets, relative intensity), from which rolling training-load metrics are
+    computed with cumulative sums and reshapes instead of Python loops.
+
+    Every set is attributed to all the muscles its exercise works (see
+    exercise_to_muscle_map). The log may hold several users, told apart by a
+    'User' column. Days run from the Monday before the first logged day to
+    the Sunday after the last one, so that weeks are whole rows of 7 days.
+    """
+
+    def __init__(
+        self, df: pd.DataFrame, exercise_to_muscle_map=exercise_to_muscle_map
+    ):
+        # Sets without a date, an exercise or (multi-user logs) a user cannot
+        # be placed in the matrices: they are dropped and counted
+        dates = parse_log_dates(df["Date"]).dt.normalize()
+        keep = dates.notna().to_numpy() & df["Exercise name"].notna().to_numpy()
+        if USER_COLUMN in df.columns:
+            keep &= df[USER_COLUMN].notna().to_numpy()
+        self.dropped_sets = int(len(keep) - keep.sum())
+        df, dates = df[keep], dates[keep]
+
+        self.multi_user = USER_COLUMN in df.columns
+        if self.multi_user:
+            user_codes, self.users = _codes(df[USER_COLUMN])
+        else:
+            user_codes = np.zeros(len(df), dtype=np.intp)
+            self.users = pd.Index([None])
+        exercise_codes, exercises = _codes(df["Exercise name"])
+
+        if len(dates):
+            start = dates.min() - pd.Timedelta(days=dates.min().dayofweek)
+            days = ((dates - start) // pd.Timedelta(days=1)).to_numpy()
+            n_days = (int(days.max()) // 7 + 1) * 7
+            self.dates = pd.date_range(start, periods=n_days, freq="D", name="Date")
+        else:
+            # Empty or fully dropped log: matrices of zero days
+            days = np.empty(0, dtype=np.int64)
+            n_days = 0
+            self.dates = pd.DatetimeIndex([], name="Date")
+
+        # Exercise -> muscles incidence matrix, unknown exercises work no muscle
+        self.muscles = pd.Index(
+            list(dict.fromkeys(sum(exercise_to_muscle_map.values(), []))),
+            name="Muscle",
+        )
+        incidence = np.zeros((len(exercises), len(self.muscles)))
+        for i, exercise in enumerate(exercises):
+            for muscle in exercise_to_muscle_map.get(exercise, []):
+                incidence[i, self.muscles.get_loc(muscle)] = 1
+
+        weight = df["Charge (kg)"].to_numpy(dtype=float)
+        reps = df["Number of repetitions"].to_numpy(dtype=float)
+        tonnage = np.nan_to_num(weight * reps)
+        intensity = self._relative_intensity(df, days, user_codes, weight, reps)
+
+        # Accumulate per (user, day, exercise) with bincount, then spread the
+        # exercises over their muscles with a single matrix product
+        shape = (len(self.users), n_days, len(exercises))
+        cell = np.ravel_multi_index((user_codes, days, exercise_codes), shape)
+
+        def dense(values=None):
+            counts = np.bincount(cell, weights=values, minlength=np.prod(shape))
+            return counts.reshape(shape) @ incidence
+
+        self.tonnage = dense(tonnage)
+        self.sets = dense()
+        self.intensity_sets = dense(np.isfinite(intensity).astype(float))
+        self.intensity_sum = dense(np.nan_to_num(intensity))
+
+    @staticmethod
+    def _relative_intensity(df, days, user_codes, weight, reps):
+        if not len(days):
+            return np.empty(0)
+        # Weight of each set over the best Epley e1RM of that lift logged by
+        # the user up to and including that day. A missing equipment or
+        # execution mode (code -1) is a lift variant of its own
+        lift_codes = [user_codes] + [_codes(df[column])[0] + 1 for column in LIFT_KEY]
+        lifts = np.ravel_multi_index(
+            lift_codes, [codes.max() + 1 for codes in lift_codes]
+        )
+        n_days = days.max() + 1
+        # A single argsort on one int64 key is much faster than a lexsort
+        key = lifts.astype(np.int64) * n_days + days
+        order = np.argsort(key)
+        key, lifts = key[order], lifts[order]
+        running = segmented_cummax(epley(weight, reps)[order], lifts)
+        # Every set of a day gets the maximum reached at the end of that day,
+        # whatever the order of the sets within the day
+        day_end = np.flatnonzero(np.append(key[1:] != key[:-1], True))
+        day_id = np.cumsum(np.insert(key[1:] != key[:-1], 0, False))
+        best = np.empty(len(order))
+        best[order] = running[day_end[day_id]]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            intensity = weight / best
+        intensity[~np.isfinite(intensity) | (best <= 0)] = np.nan
+        return intensity
+
+    def _frame(self, values: np.ndarray, dates) -> pd.DataFrame:
+        index = pd.MultiIndex.from_product(
+            [self.users, dates], names=[USER_COLUMN, "Date"]
+        )
+        frame = pd.DataFrame(
+            values.reshape(-1, len(self.muscles)), index=index, columns=self.muscles
+        )
+        return frame if self.multi_user else frame.droplevel(USER_COLUMN)
+
+    def _weekly(self, values: np.ndarray) -> np.ndarray:
+        n_users, n_days, n_muscles = values.shape
+        return values.reshape(n_users, n_days // 7, 7, n_muscles)
+
+    @property
+    def weeks(self) -> pd.DatetimeIndex:
+        return self.dates[::7].rename("Week")
+
+    def daily_tonnage(self) -> pd.DataFrame:
+        return self._frame(self.tonnage, self.dates)
+
+    def weekly_tonnage(self) -> pd.DataFrame:
+        """Tonnage (kg x reps) per muscle and calendar week (indexed by Monday)."""
+        return self._frame(self._weekly(self.tonnage).sum(axis=2), self.weeks)
+
+    def weekly_sets(self) -> pd.DataFrame:
+        return self._frame(self._weekly(self.sets).sum(axis=2), self.weeks)
+
+    def relative_intensity(self) -> pd.DataFrame:
+        """
+        Mean relative intensity (weight / best e1RM so far) of the sets of
+        each muscle and week, NaN for weeks without sets.
+        """
+        total = self._weekly(self.intensity_sum).sum(axis=2)
+        count = self._weekly(self.intensity_sets).sum(axis=2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._frame(total / count, self.weeks)
+
+    def acwr(self, acute=ACUTE_DAYS, chronic=CHRONIC_DAYS) -> pd.DataFrame:
+        """
+        Daily acute:chronic workload ratio of the tonnage: mean daily load over
+        the last `acute` days divided by the mean over the last `chronic` days.
+        NaN until a full chronic window is available or when it is empty.
+        """
+        acute_load = rolling_sum(self.tonnage, acute) / acute
+        chronic_load = rolling_sum(self.tonnage, chronic) / chronic
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = acute_load / chronic_load
+        ratio[:, : chronic - 1] = np.nan
+        ratio[chronic_load == 0] = np.nan
+        return self._frame(ratio, self.dates)
+
+    def monotony(self) -> pd.DataFrame:
+        """
+        Weekly training monotony (Foster): mean daily tonnage over its standard
+        deviation within the week, NaN when the load does not vary.
+        """
+        weekly = self._weekly(self.tonnage)
+        std = weekly.std(axis=2, ddof=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            monotony = weekly.mean(axis=2) / std
+        monotony[std == 0] = np.nan
+        return self._frame(monotony, self.weeks)
+
+    def strain(self) -> pd.DataFrame:
+        """Weekly training strain: weekly tonnage times monotony."""
+        return self.weekly_tonnage() * self.monotony()
@@ -1,4 +1,7 @@
 from __future__ import annotations
+import asyncio
+import hashlib
+import json
 import os
 from dotenv import load_dotenv
 from datetime import datetime
@@ -7,14 +10,23 @@ load_dotenv()
 from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import RunnableLambda
 from typing import List
 from pydantic import BaseModel, Field
-from typing import Literal, Optional
+from typing import Literal, Optional, get_args
 
+import numpy as np
 import pandas as pd
 import ast
 
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from src.workout_log.image_preprocessing import preprocess_image_for_ocr
+from src.workout_log.log_store import set_hashes
+from src.workout_log.parse_cache import DEFAULT_CACHE_PATH, ParseCache, cache_key
 
 openai_api_key = os.getenv("OPENAI_API_KEY")
 import base64
@@ -50,11 +62,53 @@ def preprocess_image(input_img, scale_factor=0.5, quality=75):
     return base64.b64encode(buffer.read()).decode("utf-8")
 
 
+def preprocess_images(
+    input_imgs, scale_factor=0.5, quality=75, max_workers=None, byte_budget=None
+):
+    """
+    Preprocess several images in a process pool (decoding and resizing are CPU
+    bound). With a byte_budget, images go through preprocess_image_for_ocr
+    instead of a fixed scale factor. Returns the base64 strings in input order;
+    an image that fails is returned as its exception instead.
+    """
+    if byte_budget is not None:
+        preprocess = partial(preprocess_image_for_ocr, byte_budget=byte_budget)
+    else:
+        preprocess = partial(
+            preprocess_image, scale_factor=scale_factor, quality=quality
+        )
+    if len(input_imgs) < 2:
+        futures = None
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(preprocess, img) for img in input_imgs]
+    results = []
+    for i, input_img in enumerate(input_imgs):
+        try:
+            results.append(
+                preprocess(input_img) if futures is None else futures[i].result()
+            )
+        except Exception as e:
+            results.append(e)
+    return results
+
+
 class WorkoutLogger:
-    def __init__(self):
+    def __init__(
+        self,
+        llm: str | BaseChatModel = "gpt-4o-mini",
+        mllm: str | BaseChatModel = "gpt-4o",
+        use_cache=True,
+        cache_path=DEFAULT_CACHE_PATH,
+    ):
 
-        self.llm = ChatOpenAI(model="gpt-4o-mini", openai_api_key=openai_api_key)
-        self.mllm = ChatOpenAI(model="gpt-4o", openai_api_key=openai_api_key)
+        self.cache = ParseCache(cache_path) if use_cache else None
+        if isinstance(llm, str):
+            llm = ChatOpenAI(model=llm, openai_api_key=openai_api_key)
+        if isinstance(mllm, str):
+            mllm = ChatOpenAI(model=mllm, openai_api_key=openai_api_key)
+        self.llm = llm
+        self.mllm = mllm
         self.parser = JsonOutputParser(pydantic_object=Workout)
         self.system = """
         You are AI-BRO workout logger. 
@@ -75,10 +129,18 @@ class WorkoutLogger:
         If an information is not mentioned, fill with None. 
         Follow this structure : {format_instructions}. \n
         """
+        # Serializing the Workout schema is costly, chains are compiled once
+        self.format_instructions = self.parser.get_format_instructions()
+        self.chains = {mode: self.build_chain(mode) for mode in ("llm", "mllm")}
+
+    def setup_chain(self, mode, bypass_cache=False):
+        return self.chains[mode].with_config(
+            configurable={"bypass_cache": bypass_cache}
+        )
 
-    def setup_chain(self, mode):
+    def build_chain(self, mode):
         if mode == "mllm":
-            self.prompt = ChatPromptTemplate.from_messages(
+            prompt = ChatPromptTemplate.from_messages(
                 [
                     ("system", self.system),
                     (
@@ -97,15 +159,57 @@ class WorkoutLogger:
                         ],
                     ),
                 ]
-            ).partial(format_instructions=self.parser.get_format_instructions())
-            return self.prompt | self.mllm | self.parser
-        self.prompt = ChatPromptTemplate.from_messages(
+            ).partial(format_instructions=self.format_instructions)
+            return self._with_cache(prompt | self.mllm | self.parser, mode)
+        prompt = ChatPromptTemplate.from_messages(
             [
                 ("system", self.system),
                 ("human", "{input_text}"),
             ]
-        ).partial(format_instructions=self.parser.get_format_instructions())
-        return self.prompt | self.llm | self.parser
+        ).partial(format_instructions=self.format_instructions)
+        return self._with_cache(prompt | self.llm | self.parser, mode)
+
+    def _with_cache(self, chain, mode):
+        """
+        Put the parse cache in front of the chain. With the bypass_cache
+        configurable set, cached parses are ignored but the fresh ones still
+        replace them.
+        """
+        if self.cache is None:
+            return chain | RunnableLambda(stamp_workout_date)
+        llm = self.mllm if mode == "mllm" else self.llm
+        model = getattr(llm, "model_name", type(llm).__name__)
+        input_key = "input_img" if mode == "mllm" else "input_text"
+
+        def key(inputs):
+            return cache_key(
+                str(inputs[input_key]), model, self.system, WORKOUT_SCHEMA_VERSION
+            )
+
+        def bypass(config):
+            return config.get("configurable", {}).get("bypass_cache", False)
+
+        # Parses are dated before being stored (entries cached undated are
+        # dated and stored again), so that a cache hit keeps the set hashes
+        def cached_invoke(inputs, config):
+            k = key(inputs)
+            cached = None if bypass(config) else self.cache.get(k)
+            res = cached if cached is not None else chain.invoke(inputs, config)
+            res = stamp_workout_date(res)
+            if res is not cached:
+                self.cache.put(k, res)
+            return res
+
+        async def cached_ainvoke(inputs, config):
+            k = key(inputs)
+            cached = None if bypass(config) else self.cache.get(k)
+            res = cached if cached is not None else await chain.ainvoke(inputs, config)
+            res = stamp_workout_date(res)
+            if res is not cached:
+                self.cache.put(k, res)
+            return res
+
+        return RunnableLambda(cached_invoke, afunc=cached_ainvoke)
 
     def generate(
         self,
@@ -113,20 +217,134 @@ class WorkoutLogger:
         input_img=None,
         img_scale_factor=0.5,
         img_quality=100,
+        img_byte_budget=None,
+        bypass_cache=False,
     ):
 
         if input_img is not None:
-            img = preprocess_image(
-                input_img, scale_factor=img_scale_factor, quality=img_quality
-            )
+            if img_byte_budget is not None:
+                img = preprocess_image_for_ocr(input_img, byte_budget=img_byte_budget)
+            else:
+                img = preprocess_image(
+                    input_img, scale_factor=img_scale_factor, quality=img_quality
+                )
             # img = base64.b64encode(input_img).decode("utf-8")
-            chain = self.setup_chain(mode="mllm")
+            chain = self.setup_chain(mode="mllm", bypass_cache=bypass_cache)
             res = chain.invoke({"input_img": img})
             return res
 
-        chain = self.setup_chain(mode="llm")
+        chain = self.setup_chain(mode="llm", bypass_cache=bypass_cache)
         return chain.invoke({"input_text": input_text})
 
+    def _batch_inputs(
+        self, input_imgs, img_scale_factor, img_quality, img_byte_budget, max_workers
+    ):
+        imgs = preprocess_images(
+            input_imgs,
+            scale_factor=img_scale_factor,
+            quality=img_quality,
+            max_workers=max_workers,
+            byte_budget=img_byte_budget,
+        )
+        errors = {i: img for i, img in enumerate(imgs) if isinstance(img, Exception)}
+        indices = [i for i in range(len(imgs)) if i not in errors]
+        inputs = [{"input_img": imgs[i]} for i in indices]
+        return indices, inputs, errors
+
+    def generate_batch_as_completed(
+        self,
+        input_imgs: list,
+        img_scale_factor=0.5,
+        img_quality=100,
+        img_byte_budget=None,
+        max_concurrency=4,
+        max_workers=None,
+        bypass_cache=False,
+    ):
+        """
+        Parse several workout images, with at most max_concurrency LLM calls in
+        flight. Yields (index, workout) pairs as soon as each call returns;
+        failed items yield their exception instead of a workout.
+        """
+        indices, inputs, errors = self._batch_inputs(
+            input_imgs, img_scale_factor, img_quality, img_byte_budget, max_workers
+        )
+        yield from errors.items()
+        if not inputs:
+            return
+        chain = self.setup_chain(mode="mllm", bypass_cache=bypass_cache)
+        for j, res in chain.batch_as_completed(
+            inputs,
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True,
+        ):
+            yield indices[j], res
+
+    def generate_batch(
+        self,
+        input_imgs: list,
+        img_scale_factor=0.5,
+        img_quality=100,
+        img_byte_budget=None,
+        max_concurrency=4,
+        max_workers=None,
+        bypass_cache=False,
+    ) -> list:
+        """
+        Parse several workout images. Returns the workouts in input order, with
+        the exception in place of the workout for items that failed.
+        """
+        results = [None] * len(input_imgs)
+        for i, res in self.generate_batch_as_completed(
+            input_imgs,
+            img_scale_factor=img_scale_factor,
+            img_quality=img_quality,
+            img_byte_budget=img_byte_budget,
+            max_concurrency=max_concurrency,
+            max_workers=max_workers,
+            bypass_cache=bypass_cache,
+        ):
+            results[i] = res
+        return results
+
+    async def agenerate_batch(
+        self,
+        input_imgs: list,
+        img_scale_factor=0.5,
+        img_quality=100,
+        img_byte_budget=None,
+        max_concurrency=4,
+        max_workers=None,
+        bypass_cache=False,
+    ) -> list:
+        """
+        Async version of generate_batch, the LLM calls go through the chain's
+        abatch.
+        """
+        loop = asyncio.get_running_loop()
+        indices, inputs, errors = await loop.run_in_executor(
+            None,
+            partial(
+                self._batch_inputs,
+                input_imgs,
+                img_scale_factor,
+                img_quality,
+                img_byte_budget,
+                max_workers,
+            ),
+        )
+        results = [errors.get(i) for i in range(len(input_imgs))]
+        if inputs:
+            chain = self.setup_chain(mode="mllm", bypass_cache=bypass_cache)
+            outputs = await chain.abatch(
+                inputs,
+                config={"max_concurrency": max_concurrency},
+                return_exceptions=True,
+            )
+            for i, res in zip(indices, outputs):
+                results[i] = res
+        return results
+
 
 class Exercice(BaseModel):
     name: Literal[
@@ -244,42 +462,292 @@ class Workout(BaseModel):
     )
 
 
-def workout_to_dataframe(workout: dict) -> pd.DataFrame:
-    rows = []
-    exercise_set_counter = defaultdict(int)
+# Part of the parse cache key: cached parses are invalidated when the output
+# schema changes
+WORKOUT_SCHEMA_VERSION = hashlib.sha256(
+    json.dumps(Workout.model_json_schema(), sort_keys=True).encode("utf-8")
+).hexdigest()[:16]
+
+
+def _literal_values(model, field):
+    return list(get_args(model.model_fields[field].annotation))
+
+
+# Known values of the categorical columns of a workout log
+LOG_CATEGORIES = {
+    "Workout type": _literal_values(Workout, "type"),
+    "Exercise name": _literal_values(Exercice, "name"),
+    "Equipment": _literal_values(Exercice, "charge_type"),
+    "Execution mode": _literal_values(Exercice, "execution_mode"),
+}
+LOG_NUMERIC_DTYPES = {
+    "Set number ": "int16",
+    "Number of repetitions": "float32",
+    "Charge (kg)": "float32",
+    "Rest time (sec)": "float32",
+}
+# Columns stored once per workout, and once per set
+WORKOUT_COLUMNS = ["Date", "Workout name", "Workout type", "Remarks"]
+SET_COLUMNS = [
+    "Set number ",
+    "Exercise name",
+    "Equipment",
+    "Execution mode",
+    "Number of repetitions",
+    "Charge (kg)",
+    "Rest time (sec)",
+]
+LOG_COLUMNS = [
+    "Date",
+    "Workout name",
+    "Workout type",
+    "Set number ",
+    "Exercise name",
+    "Equipment",
+    "Execution mode",
+    "Number of repetitions",
+    "Charge (kg)",
+    "Rest time (sec)",
+    "Remarks",
+]
+
+
+def _categorical(values, known=()):
+    # The parser does not validate the LLM output: values outside the schema
+    # are kept as extra categories rather than turned into NaN
+    extra = set(values) - set(known) - {None}
+    return pd.Categorical(values, categories=[*known, *sorted(map(str, extra))])
+
+
+def _has_date(workout: dict) -> bool:
+    date = workout.get("date")
+    return date is not None and str(date) != "None"
+
+
+def stamp_workout_date(workout: dict) -> dict:
+    """
+    Date a parsed workout that does not mention its date with the parse time.
+    WorkoutLogger does it once per parse, before caching it: the date is part
+    of the set hashes, so the same notes must keep the same date.
+    """
+    if not isinstance(workout, dict) or _has_date(workout):
+        return workout
+    return {**workout, "date": datetime.now().strftime("%d-%m-%Y %H:%M")}
+
+
+def workout_date(workout: dict, date: str = None) -> str:
+    if _has_date(workout):
+        return workout["date"]
+    if date is None:
+        raise ValueError(
+            "Workout without a date: pass one, or parse it with WorkoutLogger"
+        )
+    return date
 
-    for set_obj in workout["sets"]:
-        exercise_name = set_obj["exercice"]["name"]
+
+def workout_to_tables(workout: dict, workout_id=0, date: str = None):
+    """
+    Compact representation of a parsed workout: a workouts table with one row
+    (date, name, type and remarks) and a sets table referencing it by
+    'Workout id', with categorical and fixed-width numeric columns. `date` is
+    used when the workout does not mention its date.
+    """
+    sets = workout["sets"]
+    exercises = [set_obj["exercice"]["name"] for set_obj in sets]
+    exercise_set_counter = defaultdict(int)
+    set_numbers = []
+    for exercise_name in exercises:
         exercise_set_counter[exercise_name] += 1
-        if "date" in workout.keys():
-            if workout["date"] is None or str(workout["date"]) == "None":
-                date = datetime.now().strftime("%d-%m-%Y %H:%M")
-            else:
-                date = workout["date"]
-        else:
-            date = datetime.now().strftime("%d-%m-%Y %H:%M")
-        row = {
-            "Date": date,
-            "Workout name": workout["name"],
-            "Workout type": workout["type"],
-            "Set number ": exercise_set_counter[exercise_name],
-            "Exercise name": exercise_name,
-            "Equipment": set_obj["exercice"]["charge_type"],
-            "Execution mode": set_obj["exercice"]["execution_mode"],
-            "Number of repetitions": set_obj["nb_reps"],
-            "Charge (kg)": set_obj["charge"],
-            "Rest time (sec)": set_obj["rest"],
-            # "Involved muscles": to_list_of_str(set_obj["muscles"]),
-            "Remarks": str(workout["remarks"]),
+        set_numbers.append(exercise_set_counter[exercise_name])
+
+    workouts = pd.DataFrame(
+        {
+            "Workout id": np.array([workout_id], dtype=np.int32),
+            "Date": [workout_date(workout, date)],
+            "Workout name": [workout["name"]],
+            "Workout type": _categorical(
+                [workout["type"]], LOG_CATEGORIES["Workout type"]
+            ),
+            "Remarks": [str(workout["remarks"])],
+        }
+    )
+    sets_table = pd.DataFrame(
+        {
+            "Workout id": np.full(len(sets), workout_id, dtype=np.int32),
+            "Set number ": np.array(set_numbers, dtype=np.int16),
+            "Exercise name": _categorical(exercises, LOG_CATEGORIES["Exercise name"]),
+            "Equipment": _categorical(
+                [set_obj["exercice"]["charge_type"] for set_obj in sets],
+                LOG_CATEGORIES["Equipment"],
+            ),
+            "Execution mode": _categorical(
+                [set_obj["exercice"]["execution_mode"] for set_obj in sets],
+                LOG_CATEGORIES["Execution mode"],
+            ),
+            "Number of repetitions": np.array(
+                [set_obj["nb_reps"] for set_obj in sets], dtype=np.float32
+            ),
+            "Charge (kg)": np.array(
+                [set_obj["charge"] for set_obj in sets], dtype=np.float32
+            ),
+            "Rest time (sec)": np.array(
+                [set_obj["rest"] for set_obj in sets], dtype=np.float32
+            ),
         }
-        rows.append(row)
+    )
+    sets_table["Set hash"] = set_hashes(flatten_log(workouts, sets_table)).to_numpy()
+    return workouts, sets_table
 
-    return pd.DataFrame(rows)
+
+def flatten_log(workouts: pd.DataFrame, sets: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per set with the workout columns repeated, as in the CSV logs. The
+    repeated columns are categoricals, so each date, name and remark is still
+    stored once.
+    """
+    position = pd.Index(workouts["Workout id"]).get_indexer(sets["Workout id"])
+    columns = {}
+    for column in LOG_COLUMNS:
+        if column in WORKOUT_COLUMNS:
+            values = workouts[column]
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype("category")
+            columns[column] = values.array.take(position)
+        else:
+            columns[column] = sets[column].array
+    if "Set hash" in sets.columns:
+        columns["Set hash"] = sets["Set hash"].to_numpy()
+    return pd.DataFrame(columns, index=sets.index)
+
+
+def split_log(df: pd.DataFrame):
+    """Split a flat log into its workouts and sets tables (see workout_to_tables)."""
+    df = compact_log(df)
+    workout_id = (
+        df.groupby(WORKOUT_COLUMNS, sort=False, observed=True, dropna=False)
+        .ngroup()
+        .astype(np.int32)
+    )
+    workouts = df.loc[~workout_id.duplicated(), WORKOUT_COLUMNS]
+    workouts.insert(0, "Workout id", workout_id[workouts.index])
+    sets_columns = SET_COLUMNS + (["Set hash"] if "Set hash" in df.columns else [])
+    sets = df[sets_columns].assign(**{"Workout id": workout_id})
+    return workouts.reset_index(drop=True), sets
+
+
+def compact_log(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cast a flat workout log (e.g. read from CSV) to compact dtypes: categoricals
+    for names, types, dates and remarks, fixed-width numbers for the rest.
+    """
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        if column in LOG_CATEGORIES and not isinstance(values.dtype, pd.CategoricalDtype):
+            values = pd.Series(
+                _categorical(values.tolist(), LOG_CATEGORIES[column]), index=df.index
+            )
+        elif column in ("Date", "Workout name", "Remarks") and not isinstance(
+            values.dtype, pd.CategoricalDtype
+        ) and not pd.api.types.is_datetime64_any_dtype(values):
+            values = values.astype("category")
+        elif column in LOG_NUMERIC_DTYPES:
+            dtype = LOG_NUMERIC_DTYPES[column]
+            if dtype.startswith("int") and values.isna().any():
+                dtype = "float32"
+            values = values.astype(dtype)
+        columns[column] = values
+    return pd.DataFrame(columns, index=df.index)
+
+
+def _union_categories(values: pd.Series, categories: pd.Index) -> pd.Series:
+    # Categories of a frame that are a prefix of the union (the first and
+    # largest frame, usually) are extended without recoding its rows
+    known = values.cat.categories
+    if known.equals(categories):
+        return values
+    if categories[: len(known)].equals(known):
+        return values.cat.add_categories(categories[len(known) :])
+    return values.cat.set_categories(categories)
+
+
+def concat_logs(frames) -> pd.DataFrame:
+    """
+    Concatenate workout logs, merging the categories of categorical columns so
+    that they stay categorical (plain pd.concat falls back to object). The
+    categories of the first frame keep their codes, so appending a workout to
+    a large log only recodes the workout.
+    """
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    categories = {}
+    for frame in frames:
+        for column in frame.columns:
+            if isinstance(frame[column].dtype, pd.CategoricalDtype):
+                known = categories.get(column)
+                new = frame[column].cat.categories
+                if known is None:
+                    categories[column] = new
+                elif not new.equals(known):
+                    categories[column] = known.append(new.difference(known))
+    frames = [
+        frame.assign(
+            **{
+                column: _union_categories(frame[column], known)
+                for column, known in categories.items()
+                if column in frame.columns
+            }
+        )
+        for frame in frames
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def workout_to_dataframe(workout: dict, date: str = None) -> pd.DataFrame:
+    return flatten_log(*workout_to_tables(workout, date=date))
 
 
 def add_workout_to_dataframe(workout: dict, df: pd.DataFrame) -> pd.DataFrame:
-    new_data = workout_to_dataframe(workout)
-    return pd.concat([df, new_data], ignore_index=True)
+    # The categories of df keep their codes: only the workout is recoded
+    return concat_logs([df, workout_to_dataframe(workout)])
+
+
+class WorkoutLog:
+    """
+    Workouts logged during a session, kept as a workouts table and a sets
+    table. Adding a workout only builds its own small tables; the full tables
+    and the flat view are assembled on demand and cached.
+    """
+
+    def __init__(self):
+        self._workouts = []
+        self._sets = []
+        self._tables = None
+
+    def __len__(self):
+        return len(self._workouts)
+
+    def add(self, workout: dict) -> pd.DataFrame:
+        """Add a parsed workout and return its flat log."""
+        workouts, sets = workout_to_tables(workout, workout_id=len(self._workouts))
+        self._workouts.append(workouts)
+        self._sets.append(sets)
+        self._tables = None
+        return flatten_log(workouts, sets)
+
+    def tables(self):
+        if self._tables is None:
+            workouts = concat_logs(self._workouts)
+            sets = concat_logs(self._sets)
+            flat = flatten_log(workouts, sets) if len(sets) else sets
+            self._tables = (workouts, sets, flat)
+        return self._tables
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return self.tables()[2]
 
 
 def to_list_of_str(entry):